@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemonAPI.middleware.PerformanceMiddleware',
+    'LittleLemonAPI.middleware.CompressionMiddleware',
+    'LittleLemonAPI.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,12 +58,12 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'LittleLemonAPI.renderers.FastJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'rest_framework.authentication.SessionAuthentication', # Should be removed at the end
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachingTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -72,6 +75,9 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'anon': '5/minute',
         'user': '10/minute',
+        # Per-view overrides of 'user', keyed '<throttle_scope>_read' / '<throttle_scope>_write'.
+        'menu_read': '10/minute',
+        'orders_write': '10/minute',
     }
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
@@ -82,6 +88,93 @@ DJOSER = {
    "USER_ID_FIELD": "username"
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Database caches shared by all worker processes; create their tables with
+    # `python manage.py createcachetable`. A database cache culls entries (expired ones
+    # first, then a 1/CULL_FREQUENCY share of the rest) once it holds more than
+    # MAX_ENTRIES, 300 by default, which would reset live throttle counters. The limits
+    # are set far above the number of active clients, and the throttle counters get a
+    # table of their own so culling them can never evict the entries in 'shared'.
+    'throttle': {
+        'BACKEND': 'LittleLemonAPI.cache_backends.AtomicDatabaseCache',
+        'LOCATION': 'littlelemon_throttle',
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000, 'CULL_FREQUENCY': 10},
+    },
+    # Cached roles, token generations, replica pins and the catalogue version.
+    'shared': {
+        'BACKEND': 'LittleLemonAPI.cache_backends.AtomicDatabaseCache',
+        'LOCATION': 'littlelemon_shared',
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000, 'CULL_FREQUENCY': 10},
+    },
+}
+
+# Cache alias used by LittleLemonAPI.throttling, shared so limits are not multiplied
+# by the number of workers.
+THROTTLE_CACHE = 'throttle'
+
+# Seconds a user's group memberships are cached between requests (0 disables), and
+# the cache alias holding them. Group changes delete the entry, so it must be shared
+# by all workers or the others keep the old roles until the timeout.
+ROLE_CACHE_TIMEOUT = 300
+ROLE_CACHE = 'shared'
+
+# CachingTokenAuthentication: tokens (with their user and roles) kept per worker
+# process, and for how many seconds (0 disables the cache). Logout, token deletion
+# and user/group changes bump the user's generation in TOKEN_GENERATION_CACHE, which
+# every lookup checks, so they take effect in all processes at once; it must be shared.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TIMEOUT = 30
+TOKEN_GENERATION_CACHE = 'shared'
+
+# Seconds a rendered menu/category GET stays cached; writes invalidate it earlier.
+# The responses are cached per worker, but the catalogue version that writes bump is
+# kept in CATALOGUE_VERSION_CACHE, which must be shared so every worker sees a bump.
+CATALOGUE_CACHE_TIMEOUT = 600
+CATALOGUE_VERSION_CACHE = 'shared'
+
+# Upper bounds of the price bands counted by /api/menu-items/search, giving
+# bands 0-5, 5-10, 10-20 and 20+.
+MENU_SEARCH_PRICE_BANDS = [5, 10, 20]
+
+# Seconds a response stored for an Idempotency-Key is replayed; clear_idempotency_keys
+# deletes older ones.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Background jobs (LittleLemonAPI.jobs, run by `manage.py run_jobs`): threads per
+# worker, seconds between polls, attempts before a job is left as failed, the first
+# retry delay (doubled per attempt) and how long a claimed job may run before
+# another worker retries it.
+JOB_WORKER_THREADS = 4
+JOB_POLL_INTERVAL = 1.0
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_TIMEOUT = 300
+
+# Orders fetched (and order items prefetched) per query by /api/orders/export/.
+ORDER_EXPORT_CHUNK_SIZE = 1000
+
+# PerformanceMiddleware: add a Server-Timing header (db, auth, permission, throttle,
+# serialize, render, total) to every response, and log the SQL of requests slower
+# than this many milliseconds to the LittleLemonAPI.slow_requests logger (None disables).
+SERVER_TIMING_HEADER = DEBUG
+SLOW_REQUEST_THRESHOLD_MS = 500
+
+# CompressionMiddleware: JSON and text responses of at least this many bytes are
+# compressed with brotli (if installed) or gzip when the client accepts it. gzip is
+# Django's GZipMiddleware (level 6, with its random padding against BREACH).
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 4
+
+# Pub/sub behind /api/async/orders/events. The in-process broker only reaches streams
+# served by the same process; keep-alive comments are sent every HEARTBEAT seconds
+# and streams are closed (and reconnected by the client) after MAX_AGE seconds.
+ORDER_EVENTS_BACKEND = 'LittleLemonAPI.events.InProcessBroker'
+ORDER_EVENTS_HEARTBEAT = 15
+ORDER_EVENTS_MAX_AGE = 300
+
 
 ROOT_URLCONF = 'LittleLemon.urls'
 
@@ -111,8 +204,28 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Keep connections open between requests, checking them before reuse.
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
 }
+# Stand-in read replicas for local testing: separate SQLite files that nothing
+# replicates into. Only used when listed in DATABASE_REPLICAS.
+for alias in ('replica1', 'replica2'):
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': BASE_DIR / f'db_{alias}.sqlite3'}
+
+DATABASE_ROUTERS = ['LittleLemonAPI.db_router.PrimaryReplicaRouter']
+
+# Aliases in DATABASES that replicate 'default'. Catalogue and order reads made by
+# safe requests go to one of them; writes and everything else go to 'default'.
+DATABASE_REPLICAS = []
+
+# Reads stay on the primary for this many seconds after a user writes a menu item,
+# category or order, and catalogue cache fills right after a menu change do too.
+# Set it above the replicas' lag. The pins are kept in REPLICA_PIN_CACHE, which
+# must be shared by the workers.
+REPLICATION_LAG_SECONDS = 5
+REPLICA_PIN_CACHE = 'shared'
 
 
 # Password validation
@@ -0,0 +1,27 @@
+"""
+Production settings: the development settings without debugging, the
+browsable API or the Server-Timing header. Select them with
+DJANGO_SETTINGS_MODULE=LittleLemon.settings_production and set
+DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS (comma separated). Deploys must
+run `migrate` and `createcachetable`: the caches shared by the workers
+(CACHES['throttle'] and CACHES['shared']) are database tables.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import REST_FRAMEWORK
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+# JSON only: the browsable API renders a full HTML page (forms, filters) per request.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['LittleLemonAPI.renderers.FastJSONRenderer'],
+}
+
+SERVER_TIMING_HEADER = False
@@ -20,6 +20,7 @@ from django.urls import path, include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('LittleLemonAPI.urls')),
+    path('api/async/', include('LittleLemonAPI.async_urls')),
     path('api/', include('djoser.urls')),
     path('api/', include('djoser.urls.authtoken'))
 ]
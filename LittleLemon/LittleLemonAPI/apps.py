@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'LittleLemonAPI'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if 'LittleLemonAPI.middleware.PerformanceMiddleware' in settings.MIDDLEWARE:
+            from .instrumentation import install
+            install()
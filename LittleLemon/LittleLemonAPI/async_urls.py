@@ -0,0 +1,6 @@
+from django.urls import path
+from .async_views import OrderEventsView
+
+urlpatterns = [
+    path("orders/events", OrderEventsView.as_view(), name="async-order-events"),
+]
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from . import events
+from .custom_permissions import MANAGER, get_roles
+from .instrumentation import TimedViewMixin
+from .throttling import AnonThrottle, UserThrottle
+
+
+class OrderEventsView(TimedViewMixin, APIView):
+    """
+    Server-sent events stream of order changes for the caller: their own
+    orders, the orders assigned to them, or every order for managers. The
+    checks run like any other view; the stream itself is an async iterator,
+    so under ASGI an open stream holds no thread.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    throttle_scope = 'orders'
+
+    def get(self, request):
+        channels = [events.user_channel(request.user.id)]
+        if MANAGER in get_roles(request.user):
+            channels.append(events.MANAGERS_CHANNEL)
+        response = StreamingHttpResponse(self.stream(channels), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, channels):
+        heartbeat = getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 15)
+        # Streams end after ORDER_EVENTS_MAX_AGE seconds and the client reconnects
+        # (after `retry` ms), which also ends the streams of clients that went away.
+        deadline = asyncio.get_running_loop().time() + getattr(settings, 'ORDER_EVENTS_MAX_AGE', 300)
+        subscription = events.get_broker().subscribe(channels)
+        try:
+            yield 'retry: 2000\n\n'
+            while (remaining := deadline - asyncio.get_running_loop().time()) > 0:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: order\ndata: {json.dumps(message)}\n\n'
+        finally:
+            subscription.close()
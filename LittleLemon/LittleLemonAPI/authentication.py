@@ -0,0 +1,141 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> (token, user, roles, generation) whose
+    entries expire after `timeout` seconds. Roles are added by get_roles()
+    once a request has resolved them. It lives in each worker process:
+    invalidate_user() evicts entries in the calling process, and the other
+    processes see that the user's generation moved on their next lookup.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys_by_user = defaultdict(set)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+        _, token, user, roles, generation = entry
+        # Each request gets its own instances; views may set attributes on request.user.
+        user = copy.copy(user)
+        if roles is not None:
+            user._roles_cache = roles
+        token = copy.copy(token)
+        token.user = user
+        return user, token, generation
+
+    def set(self, token, user, generation=None):
+        with self.lock:
+            self._remove(token.key)
+            user = copy.copy(user)
+            user.__dict__.pop('_roles_cache', None)
+            token = copy.copy(token)
+            token.user = user
+            self.entries[token.key] = [time.monotonic() + self.timeout, token, user, None, generation]
+            self.keys_by_user[user.pk].add(token.key)
+            while len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+
+    def remember_roles(self, user_id, roles):
+        with self.lock:
+            for key in self.keys_by_user.get(user_id, ()):
+                self.entries[key][3] = roles
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in list(self.keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            keys = self.keys_by_user[entry[2].pk]
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[entry[2].pk]
+
+
+token_cache = TokenCache(
+    getattr(settings, 'TOKEN_CACHE_SIZE', 10000), getattr(settings, 'TOKEN_CACHE_TIMEOUT', 30)
+)
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    if setting in ('TOKEN_CACHE_SIZE', 'TOKEN_CACHE_TIMEOUT'):
+        token_cache.maxsize = getattr(settings, 'TOKEN_CACHE_SIZE', 10000)
+        token_cache.timeout = getattr(settings, 'TOKEN_CACHE_TIMEOUT', 30)
+        token_cache.clear()
+
+def generation_cache():
+    # Shared by the workers, so a revocation reaches all of them at once.
+    return caches[getattr(settings, 'TOKEN_GENERATION_CACHE', 'default')]
+
+def generation_key(user_id):
+    return f'LittleLemonAPI:token-generation:{user_id}'
+
+def get_generation(user_id):
+    return generation_cache().get(generation_key(user_id))
+
+def bump_generation(user_id):
+    generation_cache().set(generation_key(user_id), time.time_ns(), None)
+
+def invalidate_user(user_id):
+    """
+    Drops the user's cached tokens in this process at once, and in the others
+    when the change commits: their entries were stored under an older
+    generation. A missing generation (never bumped, or evicted) is a value
+    too, so an eviction only costs the workers one lookup.
+    """
+    token_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: bump_generation(user_id))
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that resolves a token to its user and group roles
+    from token_cache, so a repeated token costs one read of the user's
+    generation from TOKEN_GENERATION_CACHE instead of the token and group
+    queries. Logout, token deletion, user changes and group changes evict the
+    user's tokens in every worker (see signals.py and invalidate_roles());
+    TOKEN_CACHE_TIMEOUT = 0 turns the cache off.
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache.timeout:
+            return super().authenticate_credentials(key)
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token, generation = cached
+            if generation == get_generation(user.pk):
+                return user, token
+            token_cache.invalidate_user(user.pk)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(token, user, get_generation(user.pk))
+        return user, token
+
@@ -0,0 +1,312 @@
+import http.client
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import reporting
+from .custom_permissions import DELIVERY_CREW, MANAGER, role_cache_key
+from .models import Cart, CartSummary, Category, MenuItem, Order, OrderItem
+from .throttling import SlidingWindowThrottle
+
+PREFIX = 'bench-'
+
+
+def generate(customers=2000, crew=50, managers=5, categories=20, menu_items=1000, orders=10000, carts=400, days=90, seed=1):
+    """
+    Inserts a reproducible data set: users with tokens, a menu, open carts and
+    an order history spread over `days`, with about half of the orders
+    assigned to delivery crew. Everything is named with PREFIX so clear() can
+    remove it again.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+    with transaction.atomic():
+        users = {
+            role: User.objects.bulk_create(
+                User(username=f'{PREFIX}{role}-{i}', password=password) for i in range(count)
+            )
+            for role, count in (('customer', customers), ('crew', crew), ('manager', managers))
+        }
+        Token.objects.bulk_create(
+            Token(key=Token.generate_key(), user=user) for group in users.values() for user in group
+        )
+        for role, name in (('crew', DELIVERY_CREW), ('manager', MANAGER)):
+            group, _ = Group.objects.get_or_create(name=name)
+            User.groups.through.objects.bulk_create(
+                User.groups.through(user_id=user.id, group_id=group.id) for user in users[role]
+            )
+        # The bulk insert skips m2m_changed, and SQLite may hand out the ids of
+        # previously cleared users again.
+        cache.delete_many([role_cache_key(user.id) for group in users.values() for user in group])
+
+        category_objects = Category.objects.bulk_create(
+            Category(slug=f'{PREFIX}{i}', title=f'Benchmark category {i}') for i in range(categories)
+        )
+        menu = MenuItem.objects.bulk_create(
+            (
+                MenuItem(
+                    title=f'{PREFIX}item-{i}', price=Decimal(rng.randrange(100, 3000)) / 100,
+                    featured=rng.random() < 0.1, category=rng.choice(category_objects),
+                )
+                for i in range(menu_items)
+            ),
+            batch_size=1000,
+        )
+
+        cart_rows, summaries = [], []
+        for customer in rng.sample(users['customer'], min(carts, customers)):
+            lines = rng.sample(menu, rng.randint(1, 5))
+            for item in lines:
+                cart_rows.append(Cart(user=customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price))
+            summaries.append(CartSummary(user=customer, item_count=len(lines), total=sum(item.price for item in lines)))
+        Cart.objects.bulk_create(cart_rows, batch_size=1000)
+        CartSummary.objects.bulk_create(summaries, batch_size=1000)
+
+        order_lines = []
+        order_objects = []
+        for _ in range(orders):
+            lines = [(item, rng.randint(1, 3)) for item in rng.sample(menu, rng.randint(1, 5))]
+            crew_member = rng.choice(users['crew']) if users['crew'] and rng.random() < 0.5 else None
+            order_objects.append(Order(
+                user=rng.choice(users['customer']), delivery_crew=crew_member,
+                status=crew_member is not None and rng.random() < 0.5,
+                total=sum(item.price * quantity for item, quantity in lines),
+            ))
+            order_lines.append(lines)
+        order_objects = Order.objects.bulk_create(order_objects, batch_size=1000)
+        OrderItem.objects.bulk_create(
+            (
+                OrderItem(order=order, menuitem=item, quantity=quantity, unit_price=item.price, price=item.price * quantity)
+                for order, lines in zip(order_objects, order_lines)
+                for item, quantity in lines
+            ),
+            batch_size=1000,
+        )
+
+        # date is auto_now_add, so spread the history out afterwards, one UPDATE per day.
+        by_day = defaultdict(list)
+        for order in order_objects:
+            by_day[rng.randrange(days)].append(order.id)
+        for offset, ids in by_day.items():
+            Order.objects.filter(id__in=ids).update(date=date.today() - timedelta(days=offset))
+        reporting.rebuild()
+
+    return counts()
+
+def clear():
+    """
+    Removes what generate() inserted. Orders and carts are removed only for
+    PREFIX users; PREFIX menu items that other users' orders or carts still
+    reference are kept (deleting them would cascade to those rows), and so
+    are their categories.
+    """
+    with transaction.atomic():
+        users = User.objects.filter(username__startswith=PREFIX)
+        # Their order items go with them.
+        Order.objects.filter(user__in=users).delete()
+        Cart.objects.filter(user__in=users).delete()
+        MenuItem.objects.filter(category__slug__startswith=PREFIX).exclude(
+            Q(id__in=OrderItem.objects.values('menuitem_id')) | Q(id__in=Cart.objects.values('menuitem_id'))
+        ).delete()
+        Category.objects.filter(slug__startswith=PREFIX, menuitem__isnull=True).delete()
+        users.delete()
+        reporting.rebuild()
+
+def counts():
+    users = User.objects.filter(username__startswith=PREFIX)
+    return {
+        'customers': users.filter(username__startswith=f'{PREFIX}customer-').count(),
+        'crew': users.filter(username__startswith=f'{PREFIX}crew-').count(),
+        'managers': users.filter(username__startswith=f'{PREFIX}manager-').count(),
+        'menu_items': MenuItem.objects.filter(category__slug__startswith=PREFIX).count(),
+        'orders': Order.objects.filter(user__in=users).count(),
+        'cart_rows': Cart.objects.filter(user__in=users).count(),
+    }
+
+
+class BenchmarkData:
+    """The tokens and ids the scenarios pick from, loaded from the generated data."""
+
+    def __init__(self):
+        tokens = Token.objects.filter(user__username__startswith=PREFIX).order_by('user_id')
+        roles = defaultdict(dict)
+        for user_id, username, key in tokens.values_list('user_id', 'user__username', 'key'):
+            roles[username[len(PREFIX):].rsplit('-', 1)[0]][user_id] = key
+        self.customers = list(roles['customer'].values())
+        self.managers = list(roles['manager'].values())
+        self.menu_items = list(
+            MenuItem.objects.filter(category__slug__startswith=PREFIX).order_by('id').values_list('id', flat=True)
+        )
+        self.crew_orders = [
+            (order_id, roles['crew'][crew_id])
+            for order_id, crew_id in Order.objects.filter(delivery_crew__in=roles['crew']).order_by('id').values_list(
+                'id', 'delivery_crew'
+            )[:1000]
+        ]
+        if not (self.customers and self.managers and self.menu_items and self.crew_orders):
+            raise ValueError("No benchmark data found; run generate_benchmark_data (or benchmark --generate) first.")
+
+
+class Scenario:
+    def __init__(self, name, request, prepare=None):
+        self.name = name
+        self.request = request
+        self.prepare = prepare
+
+
+def _cart_add(data, i):
+    customer = data.customers[i % len(data.customers)]
+    return customer, 'POST', '/api/cart/menu-items/', [
+        {'action': 'add', 'menuitem': data.menu_items[i % len(data.menu_items)], 'quantity': 1}
+    ]
+
+SCENARIOS = [
+    Scenario('menu_browse', lambda data, i: (data.customers[i % len(data.customers)], 'GET', f'/api/menu-items?page={i % 20 + 1}', None)),
+    Scenario('cart_add', _cart_add),
+    Scenario(
+        'checkout',
+        lambda data, i: (data.customers[i % len(data.customers)], 'POST', '/api/orders/', None),
+        prepare=_cart_add,
+    ),
+    Scenario('manager_orders', lambda data, i: (data.managers[i % len(data.managers)], 'GET', f'/api/orders/?perpage=50&page={i % 20 + 1}', None)),
+    Scenario('crew_delivery', lambda data, i: (data.crew_orders[i % len(data.crew_orders)][1], 'PATCH', f'/api/orders/{data.crew_orders[i % len(data.crew_orders)][0]}', {})),
+]
+
+
+class InProcessClient:
+    """Drives the URL routes through the Django test client and counts queries directly."""
+    name = 'in-process'
+
+    def __init__(self):
+        self.client = APIClient()
+        self.queries = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def request(self, token, method, path, body):
+        self.queries = 0
+        with connection.execute_wrapper(self.count_query):
+            start = time.perf_counter()
+            response = self.client.generic(
+                method, path, json.dumps(body) if body is not None else '',
+                content_type='application/json', HTTP_AUTHORIZATION=f'Token {token}',
+            )
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, self.queries
+
+
+class HTTPClient:
+    """
+    Drives a running server over one keep-alive connection. Query counts are
+    read from the Server-Timing header when the server sends it.
+    """
+
+    def __init__(self, url):
+        url = urlsplit(url)
+        if url.scheme != 'http' or not url.hostname:
+            raise ValueError("Only plain http:// URLs are supported.")
+        self.name = url.geturl()
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+    def request(self, token, method, path, body):
+        headers = {'Authorization': f'Token {token}', 'Accept': 'application/json'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        self.connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = self.connection.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        queries = None
+        for entry in (response.getheader('Server-Timing') or '').split(','):
+            if entry.strip().startswith('db;') and 'desc="' in entry:
+                queries = int(entry.split('desc="', 1)[1].split()[0])
+        return response.status, elapsed, queries
+
+
+@contextmanager
+def rolled_back():
+    """Runs the block in a transaction that is rolled back when it ends, however it ends."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+@contextmanager
+def raised_throttle_rates():
+    # Throttling still runs (and costs what it costs), it just never refuses.
+    SlidingWindowThrottle.THROTTLE_RATES = {scope: f'{10 ** 9}/day' for scope in SlidingWindowThrottle.THROTTLE_RATES}
+    try:
+        yield
+    finally:
+        del SlidingWindowThrottle.THROTTLE_RATES
+
+def run(client, data, scenarios, requests=200, warmup=20):
+    results = {}
+    for scenario in scenarios:
+        latencies, queries, statuses = [], [], Counter()
+        elapsed = 0.0
+        for i in range(warmup + requests):
+            if scenario.prepare:
+                client.request(*scenario.prepare(data, i))
+            status_code, duration, query_count = client.request(*scenario.request(data, i))
+            if i < warmup:
+                continue
+            latencies.append(duration * 1000)
+            elapsed += duration
+            statuses[status_code] += 1
+            if query_count is not None:
+                queries.append(query_count)
+        results[scenario.name] = summarize(latencies, queries, statuses, elapsed)
+    return results
+
+def summarize(latencies, queries, statuses, elapsed):
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': sum(count for status_code, count in statuses.items() if status_code >= 400),
+        'statuses': {str(status_code): count for status_code, count in sorted(statuses.items())},
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(percentiles[49], 3),
+        'p95_ms': round(percentiles[94], 3),
+        'p99_ms': round(percentiles[98], 3),
+        'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+def compare(baseline, results, tolerance=0.25):
+    """
+    Lists regressions against an earlier report: p95 latency more than
+    `tolerance` slower, more queries per request or more errors.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} ms -> {current['p95_ms']:.2f} ms")
+        # Query counts are deterministic for a given data set and --requests; half a
+        # query per request on average leaves room for one-off cache misses.
+        if None not in (current['queries_per_request'], previous['queries_per_request']) and \
+                current['queries_per_request'] > previous['queries_per_request'] + 0.5:
+            regressions.append(f"{name}: {previous['queries_per_request']} -> {current['queries_per_request']} queries per request")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {previous['errors']} -> {current['errors']} errors")
+    return regressions
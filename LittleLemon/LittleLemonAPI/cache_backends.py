@@ -0,0 +1,50 @@
+import base64
+import pickle
+
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections, router
+from django.utils import timezone
+
+
+class AtomicDatabaseCache(DatabaseCache):
+    """
+    DatabaseCache whose incr()/decr() are atomic across processes.
+
+    The stock backend implements incr() as get() followed by set(), so two
+    workers can both read 4 and both write 5. Here the new value is written
+    with a compare-and-swap UPDATE and retried if another writer got there
+    first.
+    """
+    max_incr_attempts = 10
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        now = connection.ops.adapt_datetimefield_value(timezone.now().replace(microsecond=0))
+
+        with connection.cursor() as cursor:
+            for _ in range(self.max_incr_attempts):
+                cursor.execute(
+                    "SELECT %s FROM %s WHERE %s = %%s AND %s >= %%s" % (
+                        quote_name('value'), table, quote_name('cache_key'), quote_name('expires'),
+                    ),
+                    [key, now],
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError("Key '%s' not found." % key)
+                current = connection.ops.process_clob(row[0])
+                value = pickle.loads(base64.b64decode(current.encode())) + delta
+                pickled = base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+                cursor.execute(
+                    "UPDATE %s SET %s = %%s WHERE %s = %%s AND %s = %%s" % (
+                        table, quote_name('value'), quote_name('cache_key'), quote_name('value'),
+                    ),
+                    [pickled, key, current],
+                )
+                if cursor.rowcount:
+                    return value
+        raise RuntimeError("Could not increment '%s' after %d attempts." % (key, self.max_incr_attempts))
@@ -0,0 +1,85 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .db_router import pin_to_primary
+
+VERSION_KEY = 'LittleLemonAPI:catalogue:version'
+
+
+def version_cache():
+    return caches[getattr(settings, 'CATALOGUE_VERSION_CACHE', 'default')]
+
+def get_catalogue_version():
+    version = version_cache().get(VERSION_KEY)
+    if version is None:
+        version = bump_catalogue_version()
+    return version
+
+def bump_catalogue_version():
+    """
+    Invalidates every cached catalogue response, in all workers. The
+    post_save/post_delete signals call it after a MenuItem/Category write
+    commits; QuerySet.update(), bulk_create() and bulk_update() send no
+    signals, so code writing the catalogue that way must call
+    `transaction.on_commit(bump_catalogue_version)` itself (as menu_import does).
+    """
+    # (token, last_modified); last_modified moves forward by at least one second
+    # per bump so If-Modified-Since never misses a change made within the same second.
+    cache_ = version_cache()
+    previous = cache_.get(VERSION_KEY)
+    last_modified = int(time.time())
+    if previous is not None:
+        last_modified = max(last_modified, previous[1] + 1)
+    version = (time.time_ns(), last_modified)
+    cache_.set(VERSION_KEY, version, None)
+    return version
+
+def catalogue_cache_key(request, token):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    raw = f'{token}:{request.accepted_renderer.format}:{request.get_host()}{request.path}?{query}'
+    return 'LittleLemonAPI:catalogue:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+class CatalogueCacheMixin:
+    """
+    Serves list/retrieve from the cache with a strong ETag and Last-Modified
+    tied to the catalogue version, which any MenuItem/Category write bumps.
+    The version lives in CATALOGUE_VERSION_CACHE, shared by the workers; the
+    responses are kept in each worker's default cache under the version.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        token, last_modified = get_catalogue_version()
+        key = catalogue_cache_key(request, token)
+        etag = '"%s"' % key.rsplit(':', 1)[1]
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data = cache.get(key)
+            if data is None:
+                if token > time.time_ns() - getattr(settings, 'REPLICATION_LAG_SECONDS', 5) * 10 ** 9:
+                    # The replicas may not have the change yet; don't cache their copy under the new version.
+                    pin_to_primary()
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 600))
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -1,18 +1,62 @@
+from django.conf import settings
+from django.core.cache import caches
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission
 
+from .authentication import invalidate_user, token_cache
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery Crew'
+
+
+def role_cache():
+    # Shared by the workers, so a group change reaches all of them at once.
+    return caches[getattr(settings, 'ROLE_CACHE', 'default')]
+
+def role_cache_key(user_id):
+    return f'LittleLemonAPI:roles:{user_id}'
+
+def get_roles(user):
+    # Group names are resolved once per user instance (like Django's _perm_cache)
+    # and shared between requests through the cache until membership changes.
+    if not user or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_roles_cache', None)
+    if roles is None:
+        timeout = getattr(settings, 'ROLE_CACHE_TIMEOUT', None)
+        if timeout:
+            roles = role_cache().get(role_cache_key(user.pk))
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            if timeout:
+                role_cache().set(role_cache_key(user.pk), roles, timeout)
+        token_cache.remember_roles(user.pk, roles)
+        user._roles_cache = roles
+    return roles
+
+def invalidate_roles(user_id):
+    role_cache().delete(role_cache_key(user_id))
+    invalidate_user(user_id)
+
+def is_manager(user):
+    return MANAGER in get_roles(user)
+
+def is_crew(user):
+    return DELIVERY_CREW in get_roles(user)
+
+
 class IsManager(BasePermission):
     def has_permission(self, request, view):
-        if not request.user.groups.filter(name='Manager').exists():
+        if not is_manager(request.user):
             raise PermissionDenied("You Need to be Manager to access this.")
         return True
 
 
 def is_manager_check(request):
-    return True if request.user.groups.filter(name='Manager').exists() else False
+    return is_manager(request.user)
 
 def is_crew_check(request):
-    return True if request.user.groups.filter(name='Delivery Crew').exists() else False
+    return is_crew(request.user)
 
 def is_customer_check(request):
-    return True if not is_manager_check(request) and not is_crew_check(request) else False
\ No newline at end of file
+    return True if not is_manager_check(request) and not is_crew_check(request) else False
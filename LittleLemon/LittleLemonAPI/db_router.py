@@ -0,0 +1,110 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.permissions import SAFE_METHODS
+
+# Models whose reads may be served by a replica: the catalogue and the order listings.
+# Everything else (carts, users, groups, tokens, idempotency keys...) stays on the primary.
+REPLICA_MODELS = {'LittleLemonAPI.Category', 'LittleLemonAPI.MenuItem', 'LittleLemonAPI.Order', 'LittleLemonAPI.OrderItem'}
+
+_current = ContextVar('LittleLemonAPI_database_routing', default=None)
+
+
+class RequestRouting:
+    __slots__ = ('request', 'primary', 'wrote', 'replica', 'checked_user_id')
+
+    def __init__(self, request):
+        self.request = request
+        # Unsafe requests read what they are about to change, so they never use a replica.
+        self.primary = request.method not in SAFE_METHODS
+        self.wrote = False
+        self.replica = None
+        self.checked_user_id = None
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+def pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+def pin_key(user_id):
+    return f'LittleLemonAPI:replica-pin:{user_id}'
+
+def replicated(model):
+    # The database cache routes a stand-in model whose _meta has no label.
+    return getattr(model._meta, 'label', None) in REPLICA_MODELS
+
+def start_request(request):
+    return _current.set(RequestRouting(request))
+
+def finish_request(token):
+    routing = _current.get()
+    _current.reset(token)
+    if routing is not None and routing.wrote and replicas():
+        user_id = request_user_id(routing.request)
+        if user_id is not None:
+            pin_cache().set(pin_key(user_id), True, getattr(settings, 'REPLICATION_LAG_SECONDS', 5))
+
+def pin_to_primary():
+    """Sends the remaining reads of the current request to the primary."""
+    routing = _current.get()
+    if routing is not None:
+        routing.primary = True
+
+def request_user_id(request):
+    user = request.__dict__.get('user')
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        # Not authenticated yet; resolving a session user here would query in the middle of routing.
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to 'default' and, during a request, reads of REPLICA_MODELS
+    to one of DATABASE_REPLICAS (the same one for the whole request). Reads
+    stay on the primary for unsafe requests, for the rest of a request once
+    it has written a replicated model, and for REPLICATION_LAG_SECONDS after
+    that for the same user (the pin is kept in REPLICA_PIN_CACHE, which the
+    workers should share). Outside requests (commands, migrations) everything
+    uses the primary. With DATABASE_REPLICAS empty it always answers 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from the database their parent was read from.
+            return instance._state.db
+        aliases = replicas()
+        routing = _current.get()
+        if not aliases or routing is None or not replicated(model) or self.reads_primary(routing):
+            return DEFAULT_DB_ALIAS
+        if routing.replica is None:
+            routing.replica = random.choice(aliases)
+        return routing.replica
+
+    def reads_primary(self, routing):
+        if routing.primary:
+            return True
+        user_id = request_user_id(routing.request)
+        if user_id is not None and user_id != routing.checked_user_id:
+            routing.checked_user_id = user_id
+            routing.primary = bool(pin_cache().get(pin_key(user_id)))
+        return routing.primary
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None and replicated(model):
+            routing.primary = routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
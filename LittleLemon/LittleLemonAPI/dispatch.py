@@ -0,0 +1,67 @@
+import heapq
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+
+from . import events
+from .custom_permissions import DELIVERY_CREW
+from .models import Order
+
+
+def crew_loads(usernames=None):
+    """Delivery crew members with their number of pending (undelivered) orders, in one query."""
+    crew = User.objects.filter(groups__name=DELIVERY_CREW)
+    if usernames is not None:
+        crew = crew.filter(username__in=usernames)
+    return crew.annotate(load=Count('delivery_crew', filter=Q(delivery_crew__status=False))).order_by('id')
+
+def pending_orders():
+    # Served by order_crew_status_date_idx (delivery_crew IS NULL, status = false, ORDER BY date, id).
+    return Order.objects.filter(delivery_crew__isnull=True, status=False).order_by('date', 'id')
+
+
+def assign(assignments):
+    """
+    Applies {order_id: crew_id} with one bulk_update. Orders that were assigned
+    or delivered since the caller looked are skipped; returns what was applied.
+    """
+    with transaction.atomic():
+        orders = list(pending_orders().select_for_update().filter(id__in=assignments))
+        for order in orders:
+            order.delivery_crew_id = assignments[order.id]
+            events.order_changed(order)
+        Order.objects.bulk_update(orders, ['delivery_crew'])
+    return {order.id: order.delivery_crew_id for order in orders}
+
+def auto_assign(order_ids=None, usernames=None, limit=None):
+    """
+    Hands pending unassigned orders, oldest first, to the crew member with the
+    fewest pending orders at each step (a min-heap keyed by load, ties going to
+    the lower user id), then writes them all with one bulk_update. Returns the
+    applied {order_id: crew_id} and the crew with their new loads.
+    """
+    with transaction.atomic():
+        orders = pending_orders().select_for_update()
+        if order_ids is not None:
+            orders = orders.filter(id__in=order_ids)
+        orders = list(orders[:limit] if limit else orders)
+        # Loads are read after the orders are locked, so a concurrent dispatch has
+        # either committed (and is counted) or waits for this one.
+        crew = list(crew_loads(usernames))
+        if not crew:
+            return {}, crew
+
+        queue = [(member.load, member.id) for member in crew]
+        heapq.heapify(queue)
+        for order in orders:
+            load, crew_id = heapq.heappop(queue)
+            order.delivery_crew_id = crew_id
+            heapq.heappush(queue, (load + 1, crew_id))
+            events.order_changed(order)
+        Order.objects.bulk_update(orders, ['delivery_crew'], batch_size=500)
+
+    loads = {crew_id: load for load, crew_id in queue}
+    for member in crew:
+        member.load = loads[member.id]
+    return {order.id: order.delivery_crew_id for order in orders}, crew
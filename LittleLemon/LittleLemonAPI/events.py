@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+MANAGERS_CHANNEL = 'managers'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Broker:
+    """
+    Interface of the ORDER_EVENTS_BACKEND. publish() may be called from any
+    thread and delivers a message once to each subscriber of any of the
+    channels; subscribe() is called from the event loop serving the stream
+    and returns an object with `async get()` and `close()`.
+    """
+
+    def publish(self, channels, message):
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """
+    Delivers to subscribers in this process only, so it suits a single ASGI
+    process serving both the PATCH requests and the streams. Deployments with
+    several processes need a backend on a shared channel (e.g. Redis pub/sub).
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def publish(self, channels, message):
+        with self.lock:
+            subscriptions = set().union(*(self.subscribers.get(channel, ()) for channel in channels))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            for channel in channels:
+                self.subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].discard(subscription)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+
+
+class Subscription:
+    def __init__(self, broker, channels, loop, queue_size):
+        self.broker = broker
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop has been closed.
+            self.close()
+
+    def _put(self, message):
+        # A client that stops reading loses its oldest events rather than growing the queue.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'ORDER_EVENTS_BACKEND', 'LittleLemonAPI.events.InProcessBroker'))()
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    if setting == 'ORDER_EVENTS_BACKEND':
+        get_broker.cache_clear()
+
+
+def order_changed(order, previous_crew_id=None):
+    """
+    Publishes the order's status and delivery crew, as they are when the
+    surrounding transaction commits, to its customer, its current and
+    previous crew member and the managers.
+    """
+    def publish():
+        message = {'id': order.id, 'user': order.user_id, 'delivery_crew': order.delivery_crew_id, 'status': bool(order.status)}
+        channels = {user_channel(order.user_id), MANAGERS_CHANNEL}
+        channels.update(user_channel(crew_id) for crew_id in (order.delivery_crew_id, previous_crew_id) if crew_id)
+        get_broker().publish(channels, message)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,63 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import OrderItem
+
+CSV_COLUMNS = [
+    'order_id', 'user', 'delivery_crew', 'status', 'total', 'date',
+    'order_item_id', 'menuitem', 'quantity', 'unit_price', 'price',
+]
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: writerow() returns the formatted line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_orders(queryset, chunk_size=1000):
+    # iterator() fetches the orders chunk_size rows at a time and runs the
+    # order_items prefetch once per chunk, so memory stays flat however many
+    # orders match. (date, id) is covered by order_date_id_idx.
+    items = Prefetch('order_items', queryset=OrderItem.objects.order_by('id'))
+    return queryset.order_by('date', 'id').prefetch_related(items).iterator(chunk_size=chunk_size)
+
+def order_to_dict(order):
+    # Same keys, order and value formats as OrderSerializer.
+    return {
+        'id': order.id,
+        'user': order.user_id,
+        'delivery_crew': order.delivery_crew_id,
+        'status': order.status,
+        'total': str(order.total),
+        'date': order.date.isoformat(),
+        'order_items': [
+            {
+                'id': item.id,
+                'quantity': item.quantity,
+                'unit_price': str(item.unit_price),
+                'price': str(item.price),
+                'order': item.order_id,
+                'menuitem': item.menuitem_id,
+            }
+            for item in order.order_items.all()
+        ],
+    }
+
+def stream_ndjson(queryset, chunk_size=1000):
+    for order in iter_orders(queryset, chunk_size):
+        yield json.dumps(order_to_dict(order), separators=(',', ':')) + '\n'
+
+def stream_csv(queryset, chunk_size=1000):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for order in iter_orders(queryset, chunk_size):
+        columns = [order.id, order.user_id, order.delivery_crew_id or '', int(order.status), order.total, order.date.isoformat()]
+        items = order.order_items.all()
+        if not items:
+            yield writer.writerow(columns + [''] * 5)
+        for item in items:
+            yield writer.writerow(columns + [item.id, item.menuitem_id, item.quantity, item.unit_price, item.price])
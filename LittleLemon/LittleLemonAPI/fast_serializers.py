@@ -0,0 +1,131 @@
+import decimal
+from collections import defaultdict
+from datetime import date
+from operator import attrgetter
+
+from django.db import models
+from django.db.models.query import QuerySet
+from rest_framework.response import Response
+
+from . import instrumentation
+from .models import MenuItem, Order, OrderItem
+
+
+def decimal_formatter(field):
+    # DRF's DecimalField.to_representation with COERCE_DECIMAL_TO_STRING:
+    # quantize to decimal_places (ROUND_HALF_UP, max_digits precision), then '{:f}'.
+    exponent = decimal.Decimal(1).scaleb(-field.decimal_places)
+    context = decimal.Context(prec=field.max_digits, rounding=decimal.ROUND_HALF_UP)
+
+    def format_decimal(value):
+        return '{:f}'.format(value.quantize(exponent, context=context))
+    return format_decimal
+
+
+def formatter(field):
+    """The per-column conversion to what the ModelSerializer outputs; None when the database value already is that."""
+    if isinstance(field, models.DateTimeField):
+        raise TypeError(f"{field.name}: DateTimeField output depends on the time zone and is not supported.")
+    if isinstance(field, models.DecimalField):
+        return decimal_formatter(field)
+    if isinstance(field, models.DateField):
+        return date.isoformat
+    if isinstance(field, models.BooleanField):
+        return bool
+    return None
+
+
+class ValuesSerializer:
+    """
+    Read-only list serializer that builds the same dicts as a ModelSerializer
+    from `.values_list()` rows. The model fields, their attnames and value
+    formatters are resolved once per class, so serializing a row is a zip
+    plus the decimal/date/bool conversions. Nested lists (e.g. an order's
+    items) are loaded with one query for the whole page.
+
+    Takes a queryset, rows from `rows()`, or model instances.
+    """
+    model = None
+    # Output keys in the ModelSerializer's order; nested keys come last.
+    fields = []
+    # {output key: (ValuesSerializer, foreign key name on the nested model)}
+    nested = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        names = [name for name in cls.fields if name not in cls.nested]
+        if cls.fields[len(names):] != list(cls.nested):
+            raise TypeError(f"{cls.__name__}: nested fields must come last.")
+        model_fields = [cls.model._meta.get_field(name) for name in names]
+        cls.names = names
+        cls.attnames = [field.attname for field in model_fields]
+        cls.formatters = [(index, format) for index, field in enumerate(model_fields) if (format := formatter(field))]
+        cls.getter = attrgetter(*cls.attnames)
+        cls.pk_index = cls.attnames.index(cls.model._meta.pk.attname) if cls.nested else None
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    @classmethod
+    def rows(cls, queryset):
+        # values_list() ignores select_related; prefetches would fail on tuples.
+        return queryset.prefetch_related(None).values_list(*cls.attnames)
+
+    @property
+    def data(self):
+        with instrumentation.timed('serialize'):
+            return self.serialize()
+
+    def serialize(self):
+        objects = self.rows(self.instance) if isinstance(self.instance, QuerySet) else self.instance
+        rows = list(objects)
+        if rows and isinstance(rows[0], models.Model):
+            rows = [self.getter(obj) for obj in rows]
+
+        names, formatters = self.names, self.formatters
+        results = []
+        for row in rows:
+            if formatters:
+                row = list(row)
+                for index, format in formatters:
+                    if row[index] is not None:
+                        row[index] = format(row[index])
+            results.append(dict(zip(names, row)))
+
+        for name, (serializer, foreign_key) in self.nested.items():
+            # Same lookup as prefetch_related, so the nested rows come back in the same order.
+            ids = [row[self.pk_index] for row in rows]
+            children = defaultdict(list)
+            if ids:
+                for child in serializer(serializer.model.objects.filter(**{f'{foreign_key}__in': ids})).serialize():
+                    children[child[foreign_key]].append(child)
+            for row, result in zip(rows, results):
+                result[name] = children.get(row[self.pk_index], [])
+        return results
+
+
+class ValuesListMixin:
+    """ListModelMixin.list() serializing the filtered, paginated .values_list() rows with values_serializer_class."""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.values_serializer_class
+        queryset = serializer_class.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page).data)
+        return Response(serializer_class(queryset).data)
+
+
+class MenuItemValuesSerializer(ValuesSerializer):
+    model = MenuItem
+    fields = ['id', 'title', 'price', 'featured', 'category']
+
+class OrderItemValuesSerializer(ValuesSerializer):
+    model = OrderItem
+    fields = ['id', 'quantity', 'unit_price', 'price', 'order', 'menuitem']
+
+class OrderValuesSerializer(ValuesSerializer):
+    model = Order
+    fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'order_items']
+    nested = {'order_items': (OrderItemValuesSerializer, 'order')}
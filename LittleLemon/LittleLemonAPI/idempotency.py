@@ -0,0 +1,89 @@
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def fingerprint(request):
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+def expiry():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+def clear_expired(batch_size=1000):
+    """Deletes keys older than IDEMPOTENCY_KEY_TTL, batch_size rows per statement; returns how many."""
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(created__lt=expiry()).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+def idempotent(view):
+    """
+    Makes an unsafe request carrying an Idempotency-Key header run at most
+    once per user and key. The key is claimed in the same transaction as the
+    view's writes and its row stores the response, so a retry gets the stored
+    response back without running the view again. A duplicate sent while the
+    first request is still running waits on the key's unique index and then
+    replays it. Nothing is stored when the view raises or answers with a 5xx,
+    so such a request can be retried.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, Request))
+        key = request.headers.get(HEADER)
+        if key is None or request.method in SAFE_METHODS:
+            return view(*args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({"message": f"{HEADER} must be 1 to 255 characters"}, status=status.HTTP_400_BAD_REQUEST)
+        request_fingerprint = fingerprint(request)
+
+        # A second attempt covers a claim that expired or was rolled back in between.
+        for attempt in range(2):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyKey.objects.create(user=request.user, key=key, fingerprint=request_fingerprint)
+                except IntegrityError:
+                    record = None
+                if record is not None:
+                    response = view(*args, **kwargs)
+                    if response.status_code >= 500:
+                        transaction.set_rollback(True)
+                        return response
+                    record.status_code = response.status_code
+                    record.response_data = response.data
+                    record.save(update_fields=['status_code', 'response_data'])
+                    return response
+
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                continue
+            if record.created < expiry():
+                record.delete()
+                continue
+            if record.fingerprint != request_fingerprint:
+                return Response(
+                    {"message": f"This {HEADER} was already used for a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            return Response(record.response_data, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+        return Response({"message": f"This {HEADER} is being used by another request"}, status=status.HTTP_409_CONFLICT)
+
+    return wrapper
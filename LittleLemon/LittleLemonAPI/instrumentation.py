@@ -0,0 +1,224 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.serializers import ListSerializer
+
+# Upper bounds (seconds) of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASES = ('auth', 'permission', 'throttle', 'serialize', 'render', 'compress')
+MAX_CAPTURED_QUERIES = 200
+
+_current = ContextVar('LittleLemonAPI_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('start', 'queries', 'db_time', 'phases', 'sql', 'capture_sql')
+
+    def __init__(self, capture_sql=False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.sql = []
+        self.capture_sql = capture_sql
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def start_request():
+    metrics = RequestMetrics(capture_sql=getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None) is not None)
+    return metrics, _current.set(metrics)
+
+def finish_request(token):
+    _current.reset(token)
+
+def current():
+    return _current.get()
+
+@contextmanager
+def timed(phase):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[phase] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper added to every database connection (see install())."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.db_time += duration
+        if metrics.capture_sql and len(metrics.sql) < MAX_CAPTURED_QUERIES:
+            # Only the statement: parameters carry token keys, password hashes and personal data.
+            metrics.sql.append((sql, duration))
+
+
+class Endpoint:
+    __slots__ = ('buckets', 'count', 'total', 'queries', 'db_time', 'phases', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.statuses = defaultdict(int)
+
+
+class Registry:
+    """
+    In-process aggregates per (method, route). Each worker process keeps its
+    own; Prometheus sums them across the scraped targets.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(Endpoint)
+
+    def observe(self, method, route, status_code, duration, metrics):
+        with self.lock:
+            endpoint = self.endpoints[(method, route)]
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    endpoint.buckets[index] += 1
+                    break
+            endpoint.count += 1
+            endpoint.total += duration
+            endpoint.queries += metrics.queries
+            endpoint.db_time += metrics.db_time
+            for phase, value in metrics.phases.items():
+                endpoint.phases[phase] += value
+            endpoint.statuses[status_code] += 1
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def render(self):
+        with self.lock:
+            endpoints = [
+                (f'method="{_escape(method)}",route="{_escape(route)}"', endpoint)
+                for (method, route), endpoint in sorted(self.endpoints.items())
+            ]
+            lines = _header('littlelemon_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+            for labels, endpoint in endpoints:
+                cumulative = 0
+                for bound, count in zip(BUCKETS, endpoint.buckets):
+                    cumulative += count
+                    lines.append(f'littlelemon_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'littlelemon_request_duration_seconds_bucket{{{labels},le="+Inf"}} {endpoint.count}')
+                lines.append(f'littlelemon_request_duration_seconds_sum{{{labels}}} {endpoint.total:.6f}')
+                lines.append(f'littlelemon_request_duration_seconds_count{{{labels}}} {endpoint.count}')
+
+            lines += _header('littlelemon_requests_total', 'counter', 'Responses by endpoint and status code.')
+            for labels, endpoint in endpoints:
+                for status_code, count in sorted(endpoint.statuses.items()):
+                    lines.append(f'littlelemon_requests_total{{{labels},status="{status_code}"}} {count}')
+
+            lines += _header('littlelemon_db_queries_total', 'counter', 'Database queries by endpoint.')
+            for labels, endpoint in endpoints:
+                lines.append(f'littlelemon_db_queries_total{{{labels}}} {endpoint.queries}')
+
+            lines += _header('littlelemon_db_duration_seconds_total', 'counter', 'Time spent in database queries by endpoint.')
+            for labels, endpoint in endpoints:
+                lines.append(f'littlelemon_db_duration_seconds_total{{{labels}}} {endpoint.db_time:.6f}')
+
+            lines += _header(
+                'littlelemon_phase_duration_seconds_total', 'counter',
+                'Time spent authenticating, checking permissions and throttles, serializing and rendering, by endpoint.'
+            )
+            for labels, endpoint in endpoints:
+                for phase, value in endpoint.phases.items():
+                    lines.append(f'littlelemon_phase_duration_seconds_total{{{labels},phase="{phase}"}} {value:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _header(name, kind, help):
+    return [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+class TimedViewMixin:
+    """
+    APIView mixin recording authentication, permission and throttle checks in
+    the current request's phases. Only the views that use it are timed.
+    """
+
+    def perform_authentication(self, request):
+        with timed('auth'):
+            return super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timed('permission'):
+            return super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed('permission'):
+            return super().check_object_permissions(request, obj)
+
+    def check_throttles(self, request):
+        with timed('throttle'):
+            return super().check_throttles(request)
+
+def timed_api_view(view):
+    """The same @api_view function view, with TimedViewMixin applied to its class."""
+    return type(view.cls.__name__, (TimedViewMixin, view.cls), {}).as_view(**view.initkwargs)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin recording .data in the 'serialize' phase, for many=True too."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+class TimedListSerializer(TimedSerializerMixin, ListSerializer):
+    pass
+
+
+def _add_execute_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+def install():
+    """
+    Adds record_query to every database connection. Called once from
+    AppConfig.ready(); the wrapper does nothing outside an instrumented request.
+    """
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_add_execute_wrapper, dispatch_uid='LittleLemonAPI.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _add_execute_wrapper(None, connection)
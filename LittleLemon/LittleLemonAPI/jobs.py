@@ -0,0 +1,128 @@
+import functools
+import logging
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger('LittleLemonAPI.jobs')
+
+
+class ClaimLost(Exception):
+    """The job's claim expired and another worker took it over."""
+
+
+def job(func=None, *, max_attempts=None):
+    """
+    Marks a function as a background job; `func.enqueue(**payload)` queues a
+    call to it. The payload must be JSON-serializable (DjangoJSONEncoder, so
+    dates and decimals arrive as strings).
+    """
+    if func is None:
+        return functools.partial(job, max_attempts=max_attempts)
+    func.job_name = f'{func.__module__}.{func.__qualname__}'
+    func.max_attempts = max_attempts
+    func.enqueue = functools.partial(enqueue, func)
+    return func
+
+def enqueue(func, **payload):
+    """
+    Inserts the job in the current transaction, so a worker sees it once the
+    transaction commits and it disappears with a rollback.
+    """
+    return Job.objects.create(
+        name=func.job_name,
+        payload=payload,
+        max_attempts=func.max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+        run_at=timezone.now(),
+    )
+
+
+def due():
+    now = timezone.now()
+    return Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+def claim(limit):
+    """
+    Claims up to `limit` due jobs, oldest first, including running ones whose
+    claim expired. The conditional UPDATE lets concurrent workers claim
+    without row locks, so this works on SQLite too.
+    """
+    ids = list(Job.objects.filter(due()).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Job.objects.filter(due(), id__in=ids).update(
+        status=Job.RUNNING,
+        claimed_by=token,
+        locked_until=timezone.now() + timedelta(seconds=getattr(settings, 'JOB_TIMEOUT', 300)),
+        attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(claimed_by=token, status=Job.RUNNING).order_by('run_at', 'id'))
+
+def execute(claimed):
+    """
+    Runs a claimed job. The job's writes and the deletion of its row commit
+    together, so a job that succeeded is never run again. A failure is
+    retried after JOB_RETRY_DELAY seconds, doubling per attempt, until
+    max_attempts; then the row stays as failed with the error.
+    """
+    try:
+        func = import_string(claimed.name)
+        if getattr(func, 'job_name', None) != claimed.name:
+            raise TypeError(f"{claimed.name} is not a job.")
+        with transaction.atomic():
+            func(**claimed.payload)
+            if not Job.objects.filter(id=claimed.id, claimed_by=claimed.claimed_by).delete()[0]:
+                raise ClaimLost
+        return True
+    except ClaimLost:
+        logger.warning("Job %s (%s) took longer than JOB_TIMEOUT and was rolled back.", claimed.id, claimed.name)
+        return False
+    except Exception:
+        retry = claimed.attempts < claimed.max_attempts
+        logger.exception("Job %s (%s) failed on attempt %d of %d.", claimed.id, claimed.name, claimed.attempts, claimed.max_attempts)
+        delay = getattr(settings, 'JOB_RETRY_DELAY', 10) * 2 ** (claimed.attempts - 1)
+        Job.objects.filter(id=claimed.id, claimed_by=claimed.claimed_by).update(
+            status=Job.PENDING if retry else Job.FAILED,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            locked_until=None,
+            last_error=traceback.format_exc(),
+        )
+        return False
+
+def execute_in_thread(claimed):
+    try:
+        return execute(claimed)
+    finally:
+        close_old_connections()
+
+
+def run_pending(executor=None, batch_size=100):
+    """
+    Claims and runs due jobs until none are left, on the executor's threads
+    or else in the calling thread. Returns (succeeded, failed).
+    """
+    succeeded = failed = 0
+    while True:
+        claimed = claim(batch_size)
+        if not claimed:
+            return succeeded, failed
+        if executor is None:
+            results = [execute(job) for job in claimed]
+        else:
+            results = list(executor.map(execute_in_thread, claimed))
+        succeeded += sum(results)
+        failed += len(results) - sum(results)
+
+def executor(threads):
+    """A thread pool for run_pending(), or None for threads <= 1."""
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') if threads > 1 else None
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from LittleLemonAPI import reporting
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily sales, menu item and delivery crew rollups from Order/OrderItem."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=parse_date, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', type=parse_date, help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        reporting.rebuild(options['date_from'], options['date_to'])
+        self.stdout.write(self.style.SUCCESS("Sales rollups rebuilt."))
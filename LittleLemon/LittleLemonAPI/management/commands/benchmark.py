@@ -0,0 +1,80 @@
+import json
+import platform
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from LittleLemonAPI import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the API scenarios (menu browse, cart add, checkout, manager order list, crew delivery) "
+        "against the benchmark data and prints throughput, p50/p95/p99 latency and query counts per "
+        "scenario as JSON. In-process runs are rolled back; with --url the requests go to a running "
+        "server (raise its throttle rates and set SERVER_TIMING_HEADER to get query counts)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=[scenario.name for scenario in benchmarks.SCENARIOS])
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario")
+        parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests per scenario")
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--generate', action='store_true', help="Generate the default data set first (in-process only)")
+        parser.add_argument('--output', help="Write the report to this file instead of stdout")
+        parser.add_argument('--baseline', help="Earlier report to compare against; exits non-zero on regressions")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 slowdown against the baseline")
+
+    def handle(self, *args, **options):
+        if options['url'] and options['generate']:
+            raise CommandError("--generate only works in-process; run generate_benchmark_data before starting the server.")
+        scenarios = [
+            scenario for scenario in benchmarks.SCENARIOS
+            if not options['scenarios'] or scenario.name in options['scenarios']
+        ]
+
+        if options['url']:
+            report = self.run(benchmarks.HTTPClient(options['url']), scenarios, options)
+        else:
+            # Like the test runner, accept the test client's 'testserver' host.
+            hosts = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+            with benchmarks.rolled_back(), benchmarks.raised_throttle_rates(), hosts:
+                if options['generate']:
+                    benchmarks.generate()
+                report = self.run(benchmarks.InProcessClient(), scenarios, options)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                regressions = benchmarks.compare(json.load(file), report, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + '\n  '.join(regressions))
+            self.stderr.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run(self, client, scenarios, options):
+        try:
+            data = benchmarks.BenchmarkData()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        return {
+            'target': client.name,
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': sys.platform,
+            },
+            'data': benchmarks.counts(),
+            'requests_per_scenario': options['requests'],
+            'scenarios': benchmarks.run(client, data, scenarios, options['requests'], options['warmup']),
+        }
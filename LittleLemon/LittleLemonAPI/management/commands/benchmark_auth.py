@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from LittleLemonAPI import benchmarks
+from LittleLemonAPI.authentication import CachingTokenAuthentication, token_cache
+from LittleLemonAPI.custom_permissions import MANAGER, is_manager
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-request cost of authenticating a token and resolving the user's roles "
+        "with DRF's TokenAuthentication and with CachingTokenAuthentication. All data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmarks.rolled_back():
+            self.run(options['repeat'])
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def run(self, repeat):
+        user = User.objects.create_user(username='benchmark-auth-manager')
+        user.groups.add(Group.objects.get_or_create(name=MANAGER)[0])
+        token = Token.objects.create(user=user)
+        factory = APIRequestFactory()
+
+        self.stdout.write(f"{'authentication':<28} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'queries':>8}")
+        for authentication in (TokenAuthentication, CachingTokenAuthentication):
+            cache.clear()
+            token_cache.clear()
+            timings = []
+            self.queries = 0
+            with connection.execute_wrapper(self.count_query):
+                for _ in range(repeat):
+                    request = Request(
+                        factory.get('/api/orders/', HTTP_AUTHORIZATION=f'Token {token.key}'),
+                        authenticators=[authentication()],
+                    )
+                    start = time.perf_counter()
+                    # What every authenticated view does before its own work: resolve
+                    # request.user, then the role checks of the permission helpers.
+                    assert is_manager(request.user)
+                    timings.append((time.perf_counter() - start) * 1_000_000)
+            self.stdout.write(
+                f"{authentication.__name__:<28} {statistics.mean(timings):>9.1f} {statistics.median(timings):>9.1f} "
+                f"{statistics.quantiles(timings, n=100)[98]:>9.1f} {self.queries / repeat:>8.3f}"
+            )
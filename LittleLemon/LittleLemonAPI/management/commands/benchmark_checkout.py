@@ -0,0 +1,52 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from LittleLemonAPI import benchmarks
+from LittleLemonAPI.models import Cart, CartSummary, Category, MenuItem
+from LittleLemonAPI.views import OrderListViews
+
+
+class Command(BaseCommand):
+    help = "Measures POST /api/orders/ latency for carts of different sizes. All data is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 500])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmarks.rolled_back():
+            self.run(options['sizes'], options['repeat'])
+
+    def run(self, sizes, repeat):
+        customer = User.objects.create_user(username='benchmark-checkout-customer')
+        category = Category.objects.create(slug='benchmark', title='Benchmark')
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Benchmark {i}', price=Decimal('0.50'), featured=False, category=category)
+            for i in range(max(sizes))
+        )
+        view = OrderListViews.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+
+        self.stdout.write(f"{'lines':>6} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}")
+        for size in sizes:
+            timings = []
+            for _ in range(repeat):
+                Cart.objects.bulk_create(
+                    Cart(user=customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+                    for item in menu_items[:size]
+                )
+                CartSummary.rebuild(customer.pk)
+                request = factory.post('/api/orders/')
+                force_authenticate(request, user=User.objects.get(pk=customer.pk))
+                start = time.perf_counter()
+                response = view(request)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.data
+            self.stdout.write(
+                f"{size:>6} {statistics.mean(timings):>9.2f} {statistics.median(timings):>9.2f} {max(timings):>9.2f}"
+            )
@@ -0,0 +1,93 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI import benchmarks
+from LittleLemonAPI.fast_serializers import MenuItemValuesSerializer, OrderValuesSerializer
+from LittleLemonAPI.middleware import CompressionMiddleware, brotli
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the CPU time and size per response of the menu item and order list pages: rendering "
+        "with DRF's JSONRenderer and with FastJSONRenderer, then gzip as GZipMiddleware does it and "
+        "brotli (when installed) at COMPRESSION_BROTLI_QUALITY. All data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--items-per-order', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed: FastJSONRenderer falls back to JSONRenderer.")
+        with benchmarks.rolled_back():
+            self.run(options['sizes'], options['repeat'], options['items_per_order'])
+
+    def measure(self, function, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.process_time()
+            result = function()
+            samples.append((time.process_time() - start) * 1000)
+        return result, statistics.median(samples)
+
+    def run(self, sizes, repeat, items_per_order):
+        customer = User.objects.create_user(username='benchmark-renderers-customer')
+        category = Category.objects.create(slug='benchmark-renderers', title='Benchmark')
+        menu_items = MenuItem.objects.bulk_create(
+            (
+                MenuItem(title=f'Benchmark {i}', price=Decimal(100 + i % 2900) / 100, featured=i % 10 == 0, category=category)
+                for i in range(max(sizes))
+            ),
+            batch_size=1000,
+        )
+        orders = Order.objects.bulk_create(
+            (Order(user=customer, total=Decimal('12.34')) for _ in range(max(sizes))), batch_size=1000
+        )
+        OrderItem.objects.bulk_create(
+            (
+                OrderItem(order=order, menuitem=menu_items[(i + j) % len(menu_items)], quantity=1,
+                          unit_price=Decimal('4.11'), price=Decimal('4.11'))
+                for i, order in enumerate(orders)
+                for j in range(items_per_order)
+            ),
+            batch_size=1000,
+        )
+        pages = [
+            ('menu items', lambda n: MenuItemValuesSerializer(MenuItem.objects.filter(category=category).order_by('id')[:n]).data),
+            ('orders', lambda n: OrderValuesSerializer(Order.objects.filter(user=customer).order_by('id')[:n]).data),
+        ]
+        padding = CompressionMiddleware.max_random_bytes
+        brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+
+        self.stdout.write(
+            f"{'page':<11} {'rows':>5} {'JSON bytes':>11} {'JSONRenderer ms':>16} {'Fast ms':>8} "
+            f"{'gzip bytes':>11} {'gzip ms':>8} {'br bytes':>9} {'br ms':>6}"
+        )
+        for name, serialize in pages:
+            for size in sizes:
+                data = serialize(size)
+                content, drf_ms = self.measure(lambda: JSONRenderer().render(data), repeat)
+                fast_content, fast_ms = self.measure(lambda: FastJSONRenderer().render(data), repeat)
+                if fast_content != content:
+                    raise CommandError(f"{name}: the renderers disagree at {size} rows.")
+                gzipped, gzip_ms = self.measure(lambda: compress_string(content, max_random_bytes=padding), repeat)
+                if brotli is not None:
+                    compressed, br_ms = self.measure(lambda: brotli.compress(content, quality=brotli_quality), repeat)
+                    br = f"{len(compressed):>9} {br_ms:>6.2f}"
+                else:
+                    br = f"{'-':>9} {'-':>6}"
+                self.stdout.write(
+                    f"{name:<11} {size:>5} {len(content):>11} {drf_ms:>16.2f} {fast_ms:>8.2f} "
+                    f"{len(gzipped):>11} {gzip_ms:>8.2f} {br}"
+                )
@@ -0,0 +1,77 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI import benchmarks
+from LittleLemonAPI.fast_serializers import MenuItemValuesSerializer, OrderValuesSerializer
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.serializers import MenuItemSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the ModelSerializers with the .values_list() serializers used by the list endpoints: "
+        "query + serialize + render time for menu item and order pages of different sizes, and checks "
+        "that both render the same bytes. All data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--items-per-order', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with benchmarks.rolled_back():
+            self.run(options['sizes'], options['repeat'], options['items_per_order'])
+
+    def run(self, sizes, repeat, items_per_order):
+        customer = User.objects.create_user(username='benchmark-serializers-customer')
+        category = Category.objects.create(slug='benchmark-serializers', title='Benchmark')
+        menu_items = MenuItem.objects.bulk_create(
+            (
+                MenuItem(title=f'Benchmark {i}', price=Decimal(100 + i % 2900) / 100, featured=i % 10 == 0, category=category)
+                for i in range(max(sizes))
+            ),
+            batch_size=1000,
+        )
+        orders = Order.objects.bulk_create(
+            (Order(user=customer, total=Decimal('12.34')) for _ in range(max(sizes))), batch_size=1000
+        )
+        OrderItem.objects.bulk_create(
+            (
+                OrderItem(order=order, menuitem=menu_items[(i + j) % len(menu_items)], quantity=1,
+                          unit_price=Decimal('4.11'), price=Decimal('4.11'))
+                for i, order in enumerate(orders)
+                for j in range(items_per_order)
+            ),
+            batch_size=1000,
+        )
+        menu = MenuItem.objects.filter(category=category).order_by('id')
+        order_list = Order.objects.filter(user=customer).order_by('id')
+        cases = [
+            ('menu items', lambda n: MenuItemSerializer(menu[:n], many=True).data, lambda n: MenuItemValuesSerializer(menu[:n]).data),
+            ('orders', lambda n: OrderSerializer(order_list.with_details()[:n], many=True).data, lambda n: OrderValuesSerializer(order_list[:n]).data),
+        ]
+
+        render = JSONRenderer().render
+        self.stdout.write(f"{'page':<11} {'rows':>6} {'ModelSerializer ms':>19} {'ValuesSerializer ms':>20} {'speedup':>8}")
+        for name, model_serializer, values_serializer in cases:
+            for size in sizes:
+                if render(model_serializer(size)) != render(values_serializer(size)):
+                    raise CommandError(f"{name}: the serializers disagree at {size} rows.")
+                timings = {}
+                for label, serialize in (('model', model_serializer), ('values', values_serializer)):
+                    samples = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        render(serialize(size))
+                        samples.append((time.perf_counter() - start) * 1000)
+                    timings[label] = statistics.median(samples)
+                self.stdout.write(
+                    f"{name:<11} {size:>6} {timings['model']:>19.2f} {timings['values']:>20.2f} "
+                    f"{timings['model'] / timings['values']:>7.1f}x"
+                )
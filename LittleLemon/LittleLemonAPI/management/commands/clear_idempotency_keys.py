@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import idempotency
+
+
+class Command(BaseCommand):
+    help = "Deletes stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = idempotency.clear_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
@@ -0,0 +1,59 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from LittleLemonAPI import dispatch
+from LittleLemonAPI.models import Cart, MenuItem, Order, OrderItem
+
+# SQLite reports "SCAN <table>" for full scans ("SCAN ... USING [COVERING] INDEX" walks an
+# index instead); PostgreSQL and MySQL report "Seq Scan" and "type: ALL" respectively.
+FULL_SCAN = re.compile(r'\bSCAN (?!.*\bUSING\b.*\bINDEX\b)|Seq Scan|\btype: ALL\b')
+SORT = re.compile(r'TEMP B-TREE|\bSort\b|filesort')
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN over the querysets behind the API views and reports full table scans and sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true', help="Exit non-zero if any query does a full scan")
+
+    def handle(self, *args, **options):
+        user_id = User.objects.values_list('id', flat=True).first() or 1
+        orders = Order.objects.all()
+        queries = {
+            'orders: manager list': orders.order_by('-date', '-id'),
+            'orders: customer list': orders.filter(user__id=user_id).order_by('-date', '-id'),
+            'orders: crew list': orders.filter(delivery_crew__id=user_id).order_by('-date', '-id'),
+            'orders: crew pending': orders.filter(delivery_crew__id=user_id, status=False).order_by('date', 'id'),
+            'orders: customer count': orders.filter(user__id=user_id).order_by().values('id'),
+            'orders: cursor seek': orders.filter(user__id=user_id).filter(
+                Q(date__lt='2030-01-01') | Q(date='2030-01-01', id__lt=10**9)
+            ).order_by('-date', '-id')[:11],
+            'orders: detail': orders.filter(id=1),
+            'orders: dispatch queue': dispatch.pending_orders()[:100],
+            'orders: crew loads': dispatch.crew_loads(),
+            'order items: prefetch': OrderItem.objects.filter(order_id__in=[1, 2, 3]).select_related('menuitem'),
+            'cart: by user': Cart.objects.filter(user__id=user_id),
+            'menu items: list': MenuItem.objects.order_by('id')[:5],
+            'menu items: by price': MenuItem.objects.order_by('price')[:5],
+        }
+
+        scans = 0
+        for label, queryset in queries.items():
+            plan = queryset.explain()
+            flags = []
+            if any(FULL_SCAN.search(line) for line in plan.splitlines()):
+                flags.append('FULL SCAN')
+                scans += 1
+            if SORT.search(plan):
+                flags.append('SORT')
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{label}") + (f"  [{', '.join(flags)}]" if flags else ''))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+
+        self.stdout.write(f"\n{len(queries)} queries on {connection.vendor}, {scans} with full scans.")
+        if scans and options['fail_on_scan']:
+            raise CommandError(f"{scans} queries do full table scans.")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Inserts a reproducible benchmark data set (users with tokens, categories, menu items, carts "
+        f"and orders, all prefixed '{benchmarks.PREFIX}'), or removes it with --clear."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=2000)
+        parser.add_argument('--crew', type=int, default=50)
+        parser.add_argument('--managers', type=int, default=5)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--menu-items', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--carts', type=int, default=400, help="Customers with items in their cart")
+        parser.add_argument('--days', type=int, default=90, help="Days the order history is spread over")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true', help="Remove the benchmark data instead")
+
+    def handle(self, *args, **options):
+        benchmarks.clear()
+        if options['clear']:
+            self.stdout.write(self.style.SUCCESS("Benchmark data removed."))
+            return
+        counts = benchmarks.generate(**{
+            key: options[key]
+            for key in ('customers', 'crew', 'managers', 'categories', 'menu_items', 'orders', 'carts', 'days', 'seed')
+        })
+        self.stdout.write(self.style.SUCCESS(', '.join(f"{key.replace('_', ' ')}: {value}" for key, value in counts.items())))
@@ -0,0 +1,33 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.menu_import import MenuImportError, import_menu, parse
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates or updates categories (by slug) and menu items (by id, else by title) from a CSV "
+        "or JSON file in a single transaction. Nothing is written if any row is invalid."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and roll back")
+
+    def handle(self, *args, **options):
+        format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        try:
+            with open(options['path'], 'rb') as file:
+                data = parse(file.read(), format)
+            result = import_menu(data, dry_run=options['dry_run'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        except MenuImportError as exc:
+            self.stderr.write(json.dumps(exc.errors, indent=2))
+            raise CommandError("Import failed; no changes were made.")
+
+        summary = ', '.join(f"{key.replace('_', ' ')}: {value}" for key, value in result.items())
+        self.stdout.write(self.style.SUCCESS(("Dry run - " if options['dry_run'] else '') + summary))
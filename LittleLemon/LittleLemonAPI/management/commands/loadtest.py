@@ -0,0 +1,85 @@
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives GET requests at a running server with N concurrent connections and reports "
+        "throughput and latency. Run it once against the WSGI server (e.g. gunicorn "
+        "LittleLemon.wsgi) and once against the ASGI server (e.g. uvicorn LittleLemon.asgi:application) "
+        "to compare the two. Raise DEFAULT_THROTTLE_RATES first or most "
+        "responses will be 429s."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="e.g. http://127.0.0.1:8000/api/menu-items")
+        parser.add_argument('--token', help="Token sent as 'Authorization: Token <token>'")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 1000])
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per concurrency level")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("Only plain http:// URLs are supported.")
+        path = url.path + ('?' + url.query if url.query else '')
+        headers = f"GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\nAccept: application/json\r\nConnection: close\r\n"
+        if options['token']:
+            headers += f"Authorization: Token {options['token']}\r\n"
+        request = (headers + "\r\n").encode()
+
+        results = [
+            asyncio.run(self.run_level(url.hostname, url.port or 80, request, concurrency, options['requests']))
+            for concurrency in options['concurrency']
+        ]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'conns':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+        for result in results:
+            self.stdout.write(
+                f"{result['concurrency']:>6} {result['rps']:>9.1f} {result['p50_ms']:>9.2f} "
+                f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}  {result['statuses']}"
+            )
+
+    async def run_level(self, host, port, request, concurrency, total):
+        latencies, statuses = [], Counter()
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    reader, writer = await asyncio.open_connection(host, port)
+                    writer.write(request)
+                    await writer.drain()
+                    response = await reader.read()
+                    writer.close()
+                    status = response.split(b' ', 2)[1].decode() if response else 'empty'
+                except OSError as exc:
+                    status = type(exc).__name__
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'rps': len(latencies) / elapsed,
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'statuses': dict(statuses),
+        }
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued background jobs (sales rollups) on a thread pool, polling for new ones. "
+        "Start as many workers as needed; each job runs once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=getattr(settings, 'JOB_WORKER_THREADS', 4))
+        parser.add_argument('--batch-size', type=int, default=100, help="Jobs claimed at a time")
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOB_POLL_INTERVAL', 1.0))
+        parser.add_argument('--once', action='store_true', help="Exit when no job is due instead of polling")
+
+    def handle(self, *args, **options):
+        executor = jobs.executor(options['threads'])
+        try:
+            while True:
+                succeeded, failed = jobs.run_pending(executor, options['batch_size'])
+                if succeeded or failed:
+                    self.stdout.write(f"{succeeded} jobs succeeded, {failed} failed.")
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown()
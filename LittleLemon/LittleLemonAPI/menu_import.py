@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.serializers import as_serializer_error
+
+from .catalogue_cache import bump_catalogue_version
+from .models import Category, MenuItem
+from .serializers import CategorySerializer, MenuItemImportSerializer
+
+BATCH_SIZE = 500
+
+
+class MenuImportError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def normalize(data):
+    if isinstance(data, list):
+        data = {'menu_items': data}
+    if not isinstance(data, dict):
+        raise ValueError('Expected a list of menu items or an object with "categories" and "menu_items".')
+    data = {'categories': data.get('categories') or [], 'menu_items': data.get('menu_items') or []}
+    if not all(isinstance(rows, list) for rows in data.values()):
+        raise ValueError('"categories" and "menu_items" must be lists.')
+    return data
+
+def parse(content, format):
+    """
+    Reads an import file into {'categories': [...], 'menu_items': [...]}.
+
+    JSON is either that object or a bare list of menu items. CSV has one menu
+    item per row (id, title, price, featured, category); an optional
+    category_title column creates or renames the row's category.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if format == 'json':
+        return normalize(json.loads(content))
+    if format == 'csv':
+        categories, menu_items = {}, []
+        for row in csv.DictReader(io.StringIO(content)):
+            row = {key: value for key, value in row.items() if key and value not in ('', None)}
+            title = row.pop('category_title', None)
+            if title and row.get('category'):
+                categories[row['category']] = {'slug': row['category'], 'title': title}
+            menu_items.append(row)
+        return {'categories': list(categories.values()), 'menu_items': menu_items}
+    raise ValueError(f'Unsupported format "{format}".')
+
+
+def _row_errors(serializer):
+    return [{'row': row, **errors} for row, errors in enumerate(serializer.errors) if errors]
+
+def import_menu(data, dry_run=False):
+    """
+    Upserts categories (matched by slug) and menu items (matched by id, or by
+    title when no id is given) in one transaction. Raises MenuImportError with
+    per-row errors, and changes nothing, if any row is invalid.
+    """
+    categories = CategorySerializer(data=data['categories'], many=True)
+    if not categories.is_valid():
+        raise MenuImportError({'categories': _row_errors(categories)})
+    category_rows = {row['slug']: row for row in categories.validated_data}
+
+    with transaction.atomic():
+        slugs = set(category_rows) | {
+            row['category'] for row in data['menu_items'] if isinstance(row, dict) and isinstance(row.get('category'), str)
+        }
+        # Slugs are not unique in the schema; the oldest category wins, as with titles below.
+        existing_categories = {}
+        for category in Category.objects.filter(slug__in=slugs).order_by('-id'):
+            existing_categories[category.slug] = category
+        changed_categories, new_categories = [], []
+        for slug, row in category_rows.items():
+            category = existing_categories.get(slug)
+            if category is None:
+                new_categories.append(Category(**row))
+            elif category.title != row['title']:
+                category.title = row['title']
+                changed_categories.append(category)
+        Category.objects.bulk_update(changed_categories, ['title'], batch_size=BATCH_SIZE)
+        for category in Category.objects.bulk_create(new_categories, batch_size=BATCH_SIZE):
+            existing_categories[category.slug] = category
+
+        # Rows are validated one by one (as ListSerializer would) so that the
+        # valid ones can still be checked for unknown ids and duplicates below.
+        serializer = MenuItemImportSerializer(context={'categories': existing_categories})
+        rows, errors = {}, []
+        for index, row in enumerate(data['menu_items']):
+            try:
+                rows[index] = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                errors.append({'row': index, **as_serializer_error(exc)})
+
+        by_id = MenuItem.objects.in_bulk([row['id'] for row in rows.values() if 'id' in row])
+        by_title = {}
+        for menu_item in MenuItem.objects.filter(title__in=[row['title'] for row in rows.values() if 'id' not in row]).order_by('-id'):
+            by_title[menu_item.title] = menu_item
+
+        seen, changed_items, new_items = set(), [], []
+        for index, row in rows.items():
+            if 'id' in row:
+                menu_item = by_id.get(row['id'])
+                if menu_item is None:
+                    errors.append({'row': index, 'id': [f'Invalid pk "{row["id"]}" - object does not exist.']})
+                    continue
+            else:
+                menu_item = by_title.get(row['title'])
+            key = menu_item.id if menu_item else row['title']
+            if key in seen:
+                errors.append({'row': index, 'non_field_errors': ['This menu item appears more than once in the import.']})
+                continue
+            seen.add(key)
+            if menu_item is None:
+                new_items.append(MenuItem(**row))
+                continue
+            row['category_id'] = row.pop('category').id
+            if any(getattr(menu_item, field) != value for field, value in row.items()):
+                for field, value in row.items():
+                    setattr(menu_item, field, value)
+                changed_items.append(menu_item)
+
+        if errors:
+            raise MenuImportError({'menu_items': sorted(errors, key=lambda error: error['row'])})
+
+        # An upsert on the primary key; bulk_update's CASE WHEN per row gets slow past a few thousand rows.
+        MenuItem.objects.bulk_create(
+            changed_items, update_conflicts=True, unique_fields=['id'],
+            update_fields=['title', 'price', 'featured', 'category'], batch_size=BATCH_SIZE
+        )
+        MenuItem.objects.bulk_create(new_items, batch_size=BATCH_SIZE)
+        if dry_run:
+            transaction.set_rollback(True)
+        else:
+            # bulk_create/bulk_update do not send the post_save signals that usually do this.
+            transaction.on_commit(bump_catalogue_version)
+
+    return {
+        'categories_created': len(new_categories),
+        'categories_updated': len(changed_categories),
+        'menu_items_created': len(new_items),
+        'menu_items_updated': len(changed_items),
+    }
@@ -0,0 +1,186 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import db_router, instrumentation
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+slow_request_logger = logging.getLogger('LittleLemonAPI.slow_requests')
+
+
+class PerformanceMiddleware:
+    """
+    Records latency, database queries/time and DRF phase timings per
+    endpoint into instrumentation.registry, optionally adds a Server-Timing
+    header, and logs the SQL of requests slower than SLOW_REQUEST_THRESHOLD_MS.
+    Put it first in MIDDLEWARE so the latency covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        return self.process(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        return self.process(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that too.
+        metrics = instrumentation.current()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.phases['render'] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def process(self, request, response, metrics):
+        duration = metrics.elapsed()
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        instrumentation.registry.observe(request.method, route, response.status_code, duration, metrics)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            timings = [f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"']
+            timings += [f'{phase};dur={value * 1000:.2f}' for phase, value in metrics.phases.items() if value]
+            timings.append(f'total;dur={duration * 1000:.2f}')
+            response['Server-Timing'] = ', '.join(timings)
+
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+        if threshold is not None and duration * 1000 >= threshold:
+            # The path only: query strings carry search terms and report filters, and
+            # handlers given the request (e.g. AdminEmailHandler) would print its GET data.
+            slow_request_logger.warning(
+                "Slow request: %s %s took %.1f ms (%d queries, %.1f ms in the database)\n%s",
+                request.method, request.path, duration * 1000, metrics.queries, metrics.db_time * 1000,
+                '\n'.join(f'  [{query_time * 1000:.2f} ms] {sql}' for sql, query_time in metrics.sql),
+                extra={'status_code': response.status_code},
+            )
+        return response
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header; codings with q=0 are left out."""
+    codings = {}
+    for part in header.lower().split(','):
+        coding, _, params = part.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding.strip() and q > 0:
+            codings[coding.strip()] = q
+    return codings
+
+def negotiate_encoding(header):
+    """'br' or 'gzip', whichever the client prefers (br on a tie), or None."""
+    codings = accepted_encodings(header)
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = codings.get(coding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Django's GZipMiddleware, which pads each gzip body with a random number
+    of bytes against BREACH, restricted to JSON and text responses of at
+    least COMPRESSION_MIN_SIZE bytes, with Accept-Encoding q-values honoured
+    and brotli (when installed) preferred when the client accepts it.
+    Streaming responses (the exports and the order event stream) are passed
+    through so they keep flushing as they are produced. Put it right after
+    PerformanceMiddleware, which then reports the time as the compress phase.
+    """
+    content_types = ('application/json', 'text/')
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(self.content_types):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        # Large enough to compress, so the representation depends on Accept-Encoding.
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        with instrumentation.timed('compress'):
+            if encoding == 'gzip':
+                return super().process_response(request, response)
+            content = brotli.compress(response.content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4))
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = 'br'
+        # The compressed body is not byte-identical to the one a strong ETag was computed for.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Gives PrimaryReplicaRouter the current request, and pins its user to the
+    primary for REPLICATION_LAG_SECONDS when the request wrote to a replicated
+    model, so their next reads see the write.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_router.start_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            db_router.finish_request(token)
+
+    async def __acall__(self, request):
+        token = db_router.start_request(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            db_router.finish_request(token)
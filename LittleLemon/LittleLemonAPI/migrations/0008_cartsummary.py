@@ -0,0 +1,38 @@
+# Generated by Django 4.2.1 on 2026-10-18 08:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_cart_summaries(apps, schema_editor):
+    Cart = apps.get_model('LittleLemonAPI', 'Cart')
+    CartSummary = apps.get_model('LittleLemonAPI', 'CartSummary')
+    db_alias = schema_editor.connection.alias
+    CartSummary.objects.using(db_alias).bulk_create(
+        CartSummary(user_id=row['user'], item_count=row['item_count'], total=row['total'])
+        for row in Cart.objects.using(db_alias).values('user').annotate(
+            item_count=models.Sum('quantity'), total=models.Sum('price')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('LittleLemonAPI', '0007_alter_order_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cart_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(build_cart_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+from django.db import migrations, OperationalError
+
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+# Triggers keep the index in step with every write, including bulk_create,
+# bulk_update and queryset.update(), which skip Django's signals.
+CREATE_SQL = [
+    f'''CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(
+        title, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )''',
+    f'''INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        SELECT m.id, m.title, c.title FROM "LittleLemonAPI_menuitem" m
+        JOIN "LittleLemonAPI_category" c ON c.id = m.category_id''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_insert" AFTER INSERT ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        VALUES (new.id, new.title, (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id));
+    END''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_update" AFTER UPDATE OF title, category_id ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+        INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        VALUES (new.id, new.title, (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id));
+    END''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_delete" AFTER DELETE ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+    END''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_category_update" AFTER UPDATE OF title ON "LittleLemonAPI_category" BEGIN
+        UPDATE "{FTS_TABLE}" SET category = new.title
+        WHERE rowid IN (SELECT id FROM "LittleLemonAPI_menuitem" WHERE category_id = new.id);
+    END''',
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_category_update"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_delete"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_update"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_insert"',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Only SQLite builds with FTS5 get the index; LittleLemonAPI.search falls
+    # back to plain lookups everywhere else.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+        except OperationalError:
+            return
+        cursor.execute('DROP TABLE temp.fts5_probe')
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0010_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
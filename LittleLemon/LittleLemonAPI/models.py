@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 
 class Category (models.Model):
@@ -21,6 +22,35 @@ class Cart(models.Model):
     class Meta:
         unique_together = ('menuitem', 'user')
 
+class CartSummary(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart_summary')
+    item_count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+
+    @classmethod
+    def add(cls, user, item_count, total):
+        if not cls.objects.filter(user=user).update(
+            item_count=models.F('item_count') + item_count, total=models.F('total') + total
+        ):
+            cls.objects.create(user=user, item_count=item_count, total=total)
+
+    @classmethod
+    def clear(cls, user):
+        cls.objects.filter(user=user).update(item_count=0, total=0)
+
+    @classmethod
+    def rebuild(cls, user_id):
+        totals = Cart.objects.filter(user_id=user_id).aggregate(
+            item_count=models.Sum('quantity', default=0), total=models.Sum('price', default=0)
+        )
+        cls.objects.update_or_create(user_id=user_id, defaults=totals)
+
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        return self.select_related('user', 'delivery_crew').prefetch_related(
+            models.Prefetch('order_items', queryset=OrderItem.objects.select_related('menuitem'))
+        )
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='delivery_crew', null=True)
@@ -28,6 +58,20 @@ class Order(models.Model):
     total = models.DecimalField (max_digits=6, decimal_places=2)
     date = models.DateField(db_index=True, auto_now_add=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Customer order history: WHERE user_id = ? ORDER BY date, id
+            models.Index(fields=['user', 'date', 'id'], name='order_user_date_idx'),
+            # Delivery crew list: WHERE delivery_crew_id = ? ORDER BY date, id
+            models.Index(fields=['delivery_crew', 'date', 'id'], name='order_crew_date_idx'),
+            # Delivery crew queue: WHERE delivery_crew_id = ? AND status = ? ORDER BY date, id
+            models.Index(fields=['delivery_crew', 'status', 'date', 'id'], name='order_crew_status_date_idx'),
+            # Manager history and the default cursor ordering: ORDER BY date, id
+            models.Index(fields=['date', 'id'], name='order_date_id_idx'),
+        ]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="order_items")
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -36,4 +80,64 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
     
     class Meta:
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+class DailyMenuItemSales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
+
+class DailyCrewDeliveries(models.Model):
+    date = models.DateField()
+    delivery_crew = models.ForeignKey(User, on_delete=models.CASCADE)
+    delivered = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'delivery_crew')
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # sha256 of the method, path and body the key was first used with.
+    fingerprint = models.CharField(max_length=64)
+    # Empty only inside the transaction that claims the key and runs the request.
+    status_code = models.SmallIntegerField(null=True)
+    response_data = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    # Dotted path of a function decorated with jobs.job.
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    # The worker batch that claimed the job, and until when; an expired claim is retried.
+    claimed_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Worker polling: WHERE status = ? AND run_at <= ? ORDER BY run_at, id
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
@@ -0,0 +1,143 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination:
+    """
+    Cursor pagination that seeks on the full ordering tuple (always ending in
+    the primary key) instead of OFFSET, and never runs a COUNT query.
+    """
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'perpage'
+    page_size = 10
+    max_page_size = 1000
+    ordering_fields = ['id']
+    default_ordering = ['-id']
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        position, self.reverse = self.decode_cursor(request)
+
+        ordering = [self.flip(field) for field in self.ordering] if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "A positive integer is required."})
+        if page_size < 1:
+            raise ValidationError({self.page_size_query_param: "A positive integer is required."})
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request):
+        param = request.query_params.get(self.ordering_query_param)
+        if not param:
+            return list(self.default_ordering)
+        ordering = [field.strip() for field in param.split(',') if field.strip()]
+        invalid = [field for field in ordering if field.lstrip('-') not in self.ordering_fields]
+        if invalid:
+            raise ValidationError({self.ordering_query_param: f"Cursor pagination can not order by {', '.join(invalid)}."})
+        # The primary key makes the ordering total, so every row has a unique position.
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def seek(self, ordering, position):
+        # (a, b, id) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        clauses = []
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {self.attname(f): position[i] for i, f in enumerate(ordering[:index])}
+            clauses.append(Q(**equal, **{f'{self.attname(field)}__{lookup}': position[index]}))
+        return reduce(or_, clauses)
+
+    def field(self, name):
+        name = name.lstrip('-')
+        return self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+
+    def attname(self, field):
+        return self.field(field).attname
+
+    def flip(self, field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            # A decodable cursor can still carry values the seek filter can not compare.
+            position = [self.clean(field, value) for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound("Invalid cursor")
+        return position, reverse
+
+    def clean(self, field, value):
+        field = self.field(field)
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError
+        # The field's validators catch what to_python lets through, e.g. too many digits.
+        field.run_validators(value)
+        return value
+
+    def encode_cursor(self, instance, reverse):
+        position = [getattr(instance, self.attname(field)) for field in self.ordering]
+        cursor = json.dumps({'p': position, 'r': int(reverse)}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, urlsafe_b64encode(cursor.encode()).decode())
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class OrderCursorPagination(KeysetPagination):
+    ordering_fields = ['id', 'date', 'status', 'total', 'user']
+    default_ordering = ['-date', '-id']
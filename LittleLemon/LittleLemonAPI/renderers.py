@@ -0,0 +1,33 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional: without it FastJSONRenderer is DRF's JSONRenderer
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. The output
+    is the compact UTF-8 JSON DRF renders: the types orjson does not handle
+    itself (Decimal, lazy strings, datetimes, which DRF shortens to
+    milliseconds) go through DRF's JSONEncoder, and U+2028/U+2029 are
+    escaped. Indented output (the browsable API, `; indent=` in Accept),
+    ASCII-only or non-compact settings and anything orjson refuses, e.g.
+    integers above 64 bits, fall back to JSONRenderer.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
@@ -0,0 +1,137 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from . import jobs
+from .models import DailyCrewDeliveries, DailyMenuItemSales, DailySales, Order, OrderItem
+
+
+def _increment(model, lookup, **deltas):
+    if model.objects.filter(**lookup).update(**{field: F(field) + delta for field, delta in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently since the UPDATE above.
+        model.objects.filter(**lookup).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+def _increment_menu_items(date, totals):
+    existing = {
+        row.menuitem_id: row
+        for row in DailyMenuItemSales.objects.select_for_update().filter(date=date, menuitem_id__in=totals)
+    }
+    for row in existing.values():
+        row.quantity += totals[row.menuitem_id][0]
+        row.revenue += totals[row.menuitem_id][1]
+    DailyMenuItemSales.objects.bulk_update(existing.values(), ['quantity', 'revenue'])
+    DailyMenuItemSales.objects.bulk_create(
+        DailyMenuItemSales(date=date, menuitem_id=menuitem_id, quantity=quantity, revenue=revenue)
+        for menuitem_id, (quantity, revenue) in totals.items()
+        if menuitem_id not in existing
+    )
+
+
+# The views queue the rollup updates in their transaction; the job worker
+# (manage.py run_jobs) applies them. Increments commute, so the jobs may run
+# in any order.
+def record_order(order, order_items):
+    apply_order.enqueue(
+        date=order.date, total=order.total, sign=1,
+        items=[[order_item.menuitem_id, order_item.quantity, order_item.price] for order_item in order_items],
+    )
+
+def remove_order(order, order_items):
+    apply_order.enqueue(
+        date=order.date, total=order.total, sign=-1,
+        items=[[order_item.menuitem_id, order_item.quantity, order_item.price] for order_item in order_items],
+    )
+    if order.status and order.delivery_crew_id:
+        record_delivery(order, order.delivery_crew_id, -1)
+
+def record_delivery(order, delivery_crew_id, delta=1):
+    apply_delivery.enqueue(date=order.date, delivery_crew_id=delivery_crew_id, delta=delta)
+
+
+@jobs.job
+def apply_order(date, total, sign, items):
+    date = datetime.date.fromisoformat(date)
+    _increment(DailySales, {'date': date}, revenue=sign * Decimal(total), order_count=sign)
+    totals = defaultdict(lambda: [0, 0])
+    for menuitem_id, quantity, price in items:
+        totals[menuitem_id][0] += sign * quantity
+        totals[menuitem_id][1] += sign * Decimal(price)
+    _increment_menu_items(date, totals)
+
+@jobs.job
+def apply_delivery(date, delivery_crew_id, delta):
+    _increment(DailyCrewDeliveries, {'date': datetime.date.fromisoformat(date), 'delivery_crew_id': delivery_crew_id}, delivered=delta)
+
+
+def rebuild(date_from=None, date_to=None):
+    """
+    Recomputes the rollups for the given date range (or everything) from
+    Order/OrderItem with one aggregate query per table.
+    """
+    dates = Q()
+    if date_from:
+        dates &= Q(date__gte=date_from)
+    if date_to:
+        dates &= Q(date__lte=date_to)
+    item_dates = Q(**{f'order__{key}': value for key, value in dates.children})
+
+    with transaction.atomic():
+        for model in (DailySales, DailyMenuItemSales, DailyCrewDeliveries):
+            model.objects.filter(dates).delete()
+
+        DailySales.objects.bulk_create(
+            DailySales(**row)
+            for row in Order.objects.filter(dates).values('date').annotate(
+                revenue=Sum('total'), order_count=Count('id')
+            ).order_by()
+        )
+        DailyMenuItemSales.objects.bulk_create(
+            DailyMenuItemSales(date=row['order__date'], menuitem_id=row['menuitem'], quantity=row['quantity'], revenue=row['revenue'])
+            for row in OrderItem.objects.filter(item_dates).values('order__date', 'menuitem').annotate(
+                quantity=Sum('quantity'), revenue=Sum('price')
+            ).order_by()
+        )
+        DailyCrewDeliveries.objects.bulk_create(
+            DailyCrewDeliveries(date=row['date'], delivery_crew_id=row['delivery_crew'], delivered=row['delivered'])
+            for row in Order.objects.filter(dates, status=True, delivery_crew__isnull=False).values(
+                'date', 'delivery_crew'
+            ).annotate(delivered=Count('id')).order_by()
+        )
+
+
+def sales_report(date_from, date_to):
+    days = DailySales.objects.filter(date__range=(date_from, date_to)).order_by('date')
+    totals = days.aggregate(revenue=Sum('revenue', default=0), order_count=Sum('order_count', default=0))
+    return {
+        'from': date_from,
+        'to': date_to,
+        'revenue': totals['revenue'],
+        'order_count': totals['order_count'],
+        'days': list(days.values('date', 'revenue', 'order_count')),
+    }
+
+def menu_item_report(date_from, date_to):
+    return list(
+        DailyMenuItemSales.objects.filter(date__range=(date_from, date_to))
+        .values('menuitem', title=F('menuitem__title'))
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .filter(quantity__gt=0)
+        .order_by('-quantity', 'menuitem')
+    )
+
+def delivery_crew_report(date_from, date_to):
+    return list(
+        DailyCrewDeliveries.objects.filter(date__range=(date_from, date_to))
+        .values('delivery_crew', username=F('delivery_crew__username'))
+        .annotate(delivered=Sum('delivered'))
+        .filter(delivered__gt=0)
+        .order_by('-delivered', 'delivery_crew')
+    )
@@ -0,0 +1,140 @@
+import hashlib
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Case, Count, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .catalogue_cache import get_catalogue_version
+from .models import MenuItem
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+_fts_tables = {}
+
+
+def fts_available(using=None):
+    """Whether migration 0011 could create the FTS5 index on this database (by default the one menu reads use)."""
+    connection = connections[using or router.db_for_read(MenuItem)]
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if key not in _fts_tables:
+        _fts_tables[key] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[key]
+
+def words(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+def match_expression(words):
+    # Each word is quoted, so user input never reaches the FTS5 query syntax,
+    # and starred, so it matches as a prefix ("marg" finds "Margherita").
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def price_bands():
+    """[(label, low, high)] from MENU_SEARCH_PRICE_BANDS, e.g. [5, 10] -> 0-5, 5-10, 10+."""
+    bounds = [Decimal(str(bound)) for bound in getattr(settings, 'MENU_SEARCH_PRICE_BANDS', [5, 10, 20])]
+    bands = []
+    for low, high in zip([Decimal(0)] + bounds, bounds + [None]):
+        label = f'{low.normalize():f}-{high.normalize():f}' if high is not None else f'{low.normalize():f}+'
+        bands.append((label, low, high))
+    return bands
+
+def price_band_q(low, high):
+    return Q(price__gte=low, price__lt=high) if high is not None else Q(price__gte=low)
+
+
+class MenuSearch:
+    """
+    Ranked full-text matching of menu items on their title and category title,
+    narrowed by the category, featured and price band facets. Uses the FTS5
+    index (bm25 ranking, title weighted over category) where it exists and
+    icontains lookups elsewhere.
+    """
+
+    def __init__(self, query='', category=None, featured=None, price=None):
+        self.words = words(query)
+        self.filters = {'category': category, 'featured': featured, 'price': price}
+
+    def matches(self):
+        items = MenuItem.objects.all()
+        if not self.words:
+            return items
+        if fts_available(items.db):
+            return items.filter(id__in=RawSQL(
+                f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s', (match_expression(self.words),)
+            ))
+        for word in self.words:
+            items = items.filter(Q(title__icontains=word) | Q(category__title__icontains=word))
+        return items
+
+    def filtered(self, exclude=None):
+        """The matches narrowed by every facet filter except `exclude`."""
+        items = self.matches()
+        if self.filters['category'] is not None and exclude != 'category':
+            items = items.filter(category__slug=self.filters['category'])
+        if self.filters['featured'] is not None and exclude != 'featured':
+            items = items.filter(featured=self.filters['featured'])
+        if self.filters['price'] is not None and exclude != 'price':
+            low, high = next((low, high) for label, low, high in price_bands() if label == self.filters['price'])
+            items = items.filter(price_band_q(low, high))
+        return items
+
+    def ids(self):
+        """
+        Ids of the filtered matches, best match first, as a lazy queryset: the
+        paginator counts them and fetches a page with LIMIT/OFFSET.
+        """
+        items = self.filtered()
+        if not self.words:
+            return items.order_by('title', 'id').values_list('id', flat=True)
+        if not fts_available(items.db):
+            first = self.words[0]
+            rank = Case(
+                When(title__istartswith=first, then=Value(0)),
+                When(Q(*[Q(title__icontains=word) for word in self.words]), then=Value(1)),
+                default=Value(2),
+            )
+            return items.alias(rank=rank).order_by('rank', 'title', 'id').values_list('id', flat=True)
+
+        # bm25() is only available inside an FTS query, so each match's rank is looked up
+        # by rowid; SQLite then keeps just the requested page while sorting.
+        rank = RawSQL(
+            f'SELECT bm25("{FTS_TABLE}", 10.0, 1.0) FROM "{FTS_TABLE}" '
+            f'WHERE "{FTS_TABLE}" MATCH %s AND rowid = "{MenuItem._meta.db_table}"."id"',
+            (match_expression(self.words),),
+        )
+        return items.alias(rank=rank).order_by('rank', 'id').values_list('id', flat=True)
+
+    def facets(self):
+        """
+        Counts per category, featured flag and price band. Each facet is
+        counted with the other facets' filters applied but not its own, so the
+        counts show what selecting another value would return. Cached until
+        the catalogue changes.
+        """
+        token, _ = get_catalogue_version()
+        raw = f'{token}:{" ".join(self.words)}:{sorted(self.filters.items())}'
+        key = 'LittleLemonAPI:search:facets:' + hashlib.md5(raw.encode()).hexdigest()
+        facets = cache.get(key)
+        if facets is None:
+            bands = price_bands()
+            price_counts = self.filtered(exclude='price').aggregate(**{
+                f'band{i}': Count('id', filter=price_band_q(low, high)) for i, (_, low, high) in enumerate(bands)
+            })
+            facets = {
+                'category': [
+                    {'slug': row['category__slug'], 'title': row['category__title'], 'count': row['count']}
+                    for row in self.filtered(exclude='category').values('category__slug', 'category__title').annotate(
+                        count=Count('id')
+                    ).order_by('category__title', 'category__slug')
+                ],
+                'featured': self.filtered(exclude='featured').aggregate(
+                    true=Count('id', filter=Q(featured=True)), false=Count('id', filter=Q(featured=False))
+                ),
+                'price': [{'band': label, 'count': price_counts[f'band{i}']} for i, (label, _, _) in enumerate(bands)],
+            }
+            cache.set(key, facets, getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 600))
+        return facets
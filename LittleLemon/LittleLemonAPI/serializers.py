@@ -1,53 +1,280 @@
+from datetime import date, timedelta
+
+from django.db import transaction
 from rest_framework import serializers
-from .models import MenuItem, Cart, Order, OrderItem, Category
+from .models import MenuItem, Cart, CartSummary, Order, OrderItem, Category
 from .models import User
+from .custom_permissions import DELIVERY_CREW
+from .instrumentation import TimedSerializerMixin
+from .search import price_bands
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItem
         fields = "__all__"
     
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = "__all__"
-        read_only_fields = ['user', 'price']
+        read_only_fields = ['user', 'unit_price', 'price']
 
     def get_price(self, obj):   
         return obj.get('quantity') * obj.get('unit_price')
 
     def create(self, validated_data):
+        validated_data["unit_price"] = validated_data["menuitem"].price
         validated_data["price"] = self.get_price(validated_data)
         validated_data["user"] = self.context['request'].user
-        return super().create(validated_data)
+        with transaction.atomic():
+            cart_item = super().create(validated_data)
+            CartSummary.add(cart_item.user, cart_item.quantity, cart_item.price)
+        return cart_item
+
+
+class CartMenuItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = MenuItem
+        fields = ['id', 'title', 'price']
+
+
+class CartDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    menuitem = CartMenuItemSerializer(read_only=True)
+
+    class Meta:
+        model = Cart
+        fields = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
+
+
+class CartSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CartSummary
+        fields = ['item_count', 'total']
+
+
+class CartBatchItemSerializer(TimedSerializerMixin, serializers.Serializer):
+    ADD, UPDATE, REMOVE = 'add', 'update', 'remove'
+
+    action = serializers.ChoiceField(choices=[ADD, UPDATE, REMOVE], default=ADD)
+    menuitem = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767, required=False)
+
+    def validate(self, attrs):
+        if attrs['action'] != self.REMOVE and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return attrs
+
 
+class CartBatchSerializer(TimedSerializerMixin, serializers.Serializer):
+    items = CartBatchItemSerializer(many=True, allow_empty=False)
 
-class OrderItemSerializer(serializers.ModelSerializer):
+    def validate_items(self, items):
+        menuitem_ids = [item['menuitem'] for item in items]
+        if len(set(menuitem_ids)) != len(menuitem_ids):
+            raise serializers.ValidationError('Each menu item may appear only once per batch.')
+        self.menu_items = MenuItem.objects.only('id', 'price').in_bulk(menuitem_ids)
+        errors = [
+            {} if item['menuitem'] in self.menu_items else {'menuitem': [f'Invalid pk "{item["menuitem"]}" - object does not exist.']}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def save(self):
+        user = self.context['request'].user
+        items = self.validated_data['items']
+        with transaction.atomic():
+            existing = {
+                cart_item.menuitem_id: cart_item
+                for cart_item in Cart.objects.select_for_update().filter(
+                    user=user, menuitem_id__in=[item['menuitem'] for item in items]
+                )
+            }
+            upserts, removals = [], []
+            item_count, total = 0, 0
+            for item in items:
+                current = existing.get(item['menuitem'])
+                if current is not None:
+                    item_count -= current.quantity
+                    total -= current.price
+                if item['action'] == CartBatchItemSerializer.REMOVE:
+                    removals.append(item['menuitem'])
+                    continue
+                quantity = item['quantity']
+                if item['action'] == CartBatchItemSerializer.ADD and current is not None:
+                    quantity += current.quantity
+                unit_price = self.menu_items[item['menuitem']].price
+                upserts.append(Cart(
+                    user=user, menuitem_id=item['menuitem'], quantity=quantity,
+                    unit_price=unit_price, price=unit_price * quantity
+                ))
+                item_count += quantity
+                total += unit_price * quantity
+
+            Cart.objects.bulk_create(
+                upserts, update_conflicts=True, unique_fields=['menuitem', 'user'],
+                update_fields=['quantity', 'unit_price', 'price']
+            )
+            if removals:
+                Cart.objects.filter(user=user, menuitem_id__in=removals).delete()
+            CartSummary.add(user, item_count, total)
+        return Cart.objects.filter(user=user)
+
+
+class OrderItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
 
-class OrderSerializer(serializers.ModelSerializer):
-    order_items = serializers.SerializerMethodField()
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    order_items = OrderItemSerializer(many=True, read_only=True)
     class Meta:
         model = Order
         fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'order_items']
 
-    def get_order_items(self, obj):
-        order_items = obj.order_items.all()
-        return OrderItemSerializer(order_items, many=True).data
-
 
-class ManagerOrderSerializer(serializers.Serializer):   
+class ManagerOrderSerializer(TimedSerializerMixin, serializers.Serializer):   
     username = serializers.CharField(max_length=255) 
 
-class ManagerSerializer(serializers.Serializer):   
+class ManagerSerializer(TimedSerializerMixin, serializers.Serializer):   
     username = serializers.CharField(max_length=255) 
 
-class DeliveryCrewSerializer(serializers.Serializer):
-    username = serializers.CharField(max_length=255)
\ No newline at end of file
+class DeliveryCrewSerializer(TimedSerializerMixin, serializers.Serializer):
+    username = serializers.CharField(max_length=255)
+
+
+class ReportRangeSerializer(TimedSerializerMixin, serializers.Serializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ?from=...&to=... can not be declared as class attributes.
+        self.fields['from'] = serializers.DateField(required=False, source='date_from')
+        self.fields['to'] = serializers.DateField(required=False, source='date_to')
+
+    def validate(self, attrs):
+        attrs.setdefault('date_to', date.today())
+        attrs.setdefault('date_from', attrs['date_to'] - timedelta(days=30))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'from': '"from" must not be after "to".'})
+        return attrs
+
+class SalesDaySerializer(TimedSerializerMixin, serializers.Serializer):
+    date = serializers.DateField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    order_count = serializers.IntegerField()
+
+class SalesReportSerializer(TimedSerializerMixin, serializers.Serializer):
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    order_count = serializers.IntegerField()
+    days = SalesDaySerializer(many=True)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        return {'from': instance['from'].isoformat(), 'to': instance['to'].isoformat(), **data}
+
+class MenuItemSalesSerializer(TimedSerializerMixin, serializers.Serializer):
+    menuitem = serializers.IntegerField()
+    title = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class DeliveryCrewDeliveriesSerializer(TimedSerializerMixin, serializers.Serializer):
+    delivery_crew = serializers.IntegerField()
+    username = serializers.CharField()
+    delivered = serializers.IntegerField()
+
+class OrderExportSerializer(TimedSerializerMixin, serializers.Serializer):
+    type = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    status = serializers.BooleanField(required=False)
+    delivery_crew = serializers.IntegerField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['from'] = serializers.DateField(required=False, source='date_from')
+        self.fields['to'] = serializers.DateField(required=False, source='date_to')
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'from': '"from" must not be after "to".'})
+        return attrs
+
+
+class MenuSearchSerializer(TimedSerializerMixin, serializers.Serializer):
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200, source='query')
+    category = serializers.SlugField(required=False)
+    featured = serializers.BooleanField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The bands follow MENU_SEARCH_PRICE_BANDS, so they are read per request.
+        self.fields['price'] = serializers.ChoiceField(choices=[label for label, _, _ in price_bands()], required=False)
+
+
+class MenuItemImportSerializer(MenuItemSerializer):
+    id = serializers.IntegerField(required=False)
+    category = serializers.SlugField()
+
+    def validate_category(self, slug):
+        # Slugs are resolved against a map loaded once per import instead of a query per row.
+        if slug not in self.context['categories']:
+            raise serializers.ValidationError(f'Category with slug "{slug}" does not exist.')
+        return self.context['categories'][slug]
+
+
+class CrewLoadSerializer(TimedSerializerMixin, serializers.Serializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    load = serializers.IntegerField()
+
+
+class DispatchAssignmentSerializer(TimedSerializerMixin, serializers.Serializer):
+    order = serializers.IntegerField()
+    delivery_crew = serializers.CharField(max_length=150)
+
+
+class DispatchSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Either explicit `assignments` ({order, delivery_crew username} pairs), or
+    `auto` to spread pending orders (optionally only `orders`, at most `limit`)
+    over the crew (optionally only the `delivery_crew` usernames) by load.
+    """
+    assignments = DispatchAssignmentSerializer(many=True, required=False, allow_empty=False)
+    auto = serializers.BooleanField(default=False)
+    orders = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    delivery_crew = serializers.ListField(child=serializers.CharField(max_length=150), required=False, allow_empty=False)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_assignments(self, assignments):
+        order_ids = [assignment['order'] for assignment in assignments]
+        if len(set(order_ids)) != len(order_ids):
+            raise serializers.ValidationError('Each order may appear only once.')
+        crew = dict(
+            User.objects.filter(
+                groups__name=DELIVERY_CREW, username__in={assignment['delivery_crew'] for assignment in assignments}
+            ).values_list('username', 'id')
+        )
+        orders = Order.objects.filter(id__in=order_ids).in_bulk()
+        errors = []
+        for assignment in assignments:
+            error = {}
+            order = orders.get(assignment['order'])
+            if order is None:
+                error['order'] = [f'Invalid pk "{assignment["order"]}" - object does not exist.']
+            elif order.status or order.delivery_crew_id:
+                error['order'] = ['This order is already assigned.' if not order.status else 'This order is already delivered.']
+            if assignment['delivery_crew'] not in crew:
+                error['delivery_crew'] = [f'"{assignment["delivery_crew"]}" is not a delivery crew member.']
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return {assignment['order']: crew[assignment['delivery_crew']] for assignment in assignments}
+
+    def validate(self, attrs):
+        if ('assignments' in attrs) == attrs['auto']:
+            raise serializers.ValidationError('Send either "assignments" or "auto": true.')
+        return attrs
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_user
+from .catalogue_cache import bump_catalogue_version
+from .custom_permissions import invalidate_roles
+from .models import Cart, CartSummary, Category, MenuItem
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.__dict__.pop('_roles_cache', None)
+            invalidate_roles(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in pk_set:
+            invalidate_roles(user_id)
+    elif action == 'pre_clear':
+        # group.user_set.clear() does not report the affected users.
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            invalidate_roles(user_id)
+
+
+# Deleting a group removes its memberships without m2m_changed, and renaming it
+# changes its members' roles.
+@receiver(pre_delete, sender=Group)
+def remember_group_members(sender, instance, **kwargs):
+    instance._member_ids = list(instance.user_set.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_roles(sender, instance, **kwargs):
+    for user_id in getattr(instance, '_member_ids', ()):
+        invalidate_roles(user_id)
+
+@receiver(post_save, sender=Group)
+def invalidate_renamed_group_roles(sender, instance, created, **kwargs):
+    if not created:
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            invalidate_roles(user_id)
+
+
+# Cached token authentication: a deleted token (djoser's logout deletes the
+# user's tokens), a logout and any change to the user drop the user's entries.
+# Group changes go through invalidate_roles() above.
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalogue(sender, **kwargs):
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(pre_delete, sender=MenuItem)
+def remember_cart_owners(sender, instance, **kwargs):
+    # Deleting a menu item cascades to cart rows without touching the summaries.
+    instance._cart_user_ids = list(Cart.objects.filter(menuitem=instance).values_list('user_id', flat=True))
+
+@receiver(post_delete, sender=MenuItem)
+def rebuild_cart_summaries(sender, instance, **kwargs):
+    for user_id in getattr(instance, '_cart_user_ids', ()):
+        CartSummary.rebuild(user_id)
@@ -1,3 +1,1360 @@
-from django.test import TestCase
+import asyncio
+import copy
+import csv
+import gzip
+import json
+import re
+import tempfile
+import time
+from base64 import urlsafe_b64encode
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from . import benchmarks, db_router, events, instrumentation, jobs, renderers, search
+from .authentication import TokenCache, token_cache
+from .catalogue_cache import VERSION_KEY, bump_catalogue_version
+from .custom_permissions import get_roles, role_cache_key
+from .middleware import brotli, negotiate_encoding
+from .throttling import UserThrottle
+from .models import Cart, CartSummary, Category, IdempotencyKey, Job, MenuItem, Order, OrderItem
+from .fast_serializers import MenuItemValuesSerializer, OrderValuesSerializer
+from .serializers import MenuItemSerializer, OrderSerializer
+
+
+# Query budgets cover the views' own work, so the shared (database) cache used for
+# throttles, roles, token generations and the catalogue version is swapped for the
+# in-memory default.
+@override_settings(
+    THROTTLE_CACHE='default', ROLE_CACHE='default', CATALOGUE_VERSION_CACHE='default', TOKEN_GENERATION_CACHE='default',
+)
+class LittleLemonTestCase(APITestCase):
+    """
+    The Manager and Delivery Crew groups, a manager, a customer and the
+    'mains' category. Each test starts with empty caches, and its client
+    sends `token` when the class creates one.
+    """
+    token = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager_group = Group.objects.create(name='Manager')
+        cls.crew_group = Group.objects.create(name='Delivery Crew')
+        cls.manager = User.objects.create_user(username='manager', password='admin@123')
+        cls.manager.groups.add(cls.manager_group)
+        cls.customer = User.objects.create_user(username='customer', password='admin@123')
+        cls.category = Category.objects.create(slug='mains', title='Mains')
+
+    def setUp(self):
+        self.clear_caches()
+        if self.token is not None:
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def clear_caches(self):
+        cache.clear()
+        token_cache.clear()
+
+
+class OrderQueryBudgetTests(LittleLemonTestCase):
+    ORDER_COUNT = 1000
+    ITEMS_PER_ORDER = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.manager)
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=False, category=cls.category)
+            for i in range(cls.ITEMS_PER_ORDER)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=cls.customer, total=Decimal('7.50')) for _ in range(cls.ORDER_COUNT)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem=menuitem, quantity=1, unit_price=menuitem.price, price=menuitem.price)
+            for order in orders
+            for menuitem in menu_items
+        )
+
+    def get_orders(self, perpage):
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/', {'perpage': perpage, 'ordering': 'id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), perpage)
+        self.assertEqual(len(response.data[-1]['order_items']), self.ITEMS_PER_ORDER)
+        return len(queries)
+
+    def test_order_list_query_count_is_constant(self):
+        counts = {perpage: self.get_orders(perpage) for perpage in (10, 100, 1000)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        self.assertLessEqual(counts[10], 5)
+
+    def test_order_detail_query_count(self):
+        order = Order.objects.first()
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/orders/{order.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['order_items']), self.ITEMS_PER_ORDER)
+
+
+class RoleCacheTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.manager)
+
+    def test_roles_are_resolved_once_and_shared_between_requests(self):
+        user = User.objects.get(pk=self.customer.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_roles(user), frozenset())
+            get_roles(user)
+        with self.assertNumQueries(0):
+            get_roles(User(pk=self.customer.pk, username='customer'))
+
+    def test_group_changes_invalidate_cached_roles(self):
+        get_roles(User.objects.get(pk=self.customer.pk))
+        response = self.client.post('/api/groups/delivery-crew/users/', {'username': 'customer'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), {'Delivery Crew'})
+
+        response = self.client.delete(f'/api/groups/delivery-crew/users/{self.customer.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), frozenset())
+
+        Group.objects.get(name='Manager').user_set.add(self.customer)
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), {'Manager'})
+
+    @override_settings(ROLE_CACHE='shared')
+    def test_roles_are_shared_and_dropped_when_a_group_changes(self):
+        shared = caches['shared']
+        get_roles(User.objects.get(pk=self.manager.pk))
+        self.assertEqual(shared.get(role_cache_key(self.manager.pk)), {'Manager'})
+
+        Group.objects.filter(name='Manager').update(name='Managers')
+        Group.objects.get(name='Managers').save()
+        self.assertIsNone(shared.get(role_cache_key(self.manager.pk)))
+        self.assertEqual(get_roles(User.objects.get(pk=self.manager.pk)), {'Managers'})
+
+        # Deleting the group drops its memberships without m2m_changed.
+        Group.objects.get(name='Managers').delete()
+        self.assertIsNone(shared.get(role_cache_key(self.manager.pk)))
+        self.assertEqual(get_roles(User.objects.get(pk=self.manager.pk)), frozenset())
+
+
+class TokenCacheTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.customer)
+        cls.order = Order.objects.create(user=cls.customer, total=Decimal('5.00'))
+
+    def test_repeated_token_resolves_user_and_roles_without_queries(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 200)
+        cache.delete(role_cache_key(self.customer.pk))
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 200)
+        # Neither the token/user join nor the groups query runs again, even with the role cache cleared.
+        self.assertEqual(len(first) - len(second), 2)
+
+    def test_logout_token_deletion_and_user_changes_evict_the_token(self):
+        self.client.get(f'/api/orders/{self.order.id}')
+        self.assertEqual(self.client.post('/api/token/logout/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 401)
+
+        token = Token.objects.create(user=self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.client.get(f'/api/orders/{self.order.id}')
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 401)
+
+    def test_group_changes_evict_cached_roles(self):
+        self.assertEqual(self.client.get('/api/orders/dispatch/').status_code, 403)
+        Group.objects.get(name='Manager').user_set.add(self.customer)
+        self.assertEqual(self.client.get('/api/orders/dispatch/').status_code, 200)
+
+    def test_revocation_reaches_other_workers_at_once(self):
+        manager_token = Token.objects.create(user=self.manager)
+        # Another worker's changes bump the shared generation but leave this process's entries alone.
+        with mock.patch.object(token_cache, 'invalidate_user'):
+            self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.token.delete()
+            self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 401)
+
+            token = Token.objects.create(user=self.customer)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.customer.is_active = False
+                self.customer.save()
+            self.assertEqual(self.client.get(f'/api/orders/{self.order.id}').status_code, 401)
+
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {manager_token.key}')
+            self.assertEqual(self.client.get('/api/orders/dispatch/').status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.manager.groups.remove(self.manager_group)
+            self.assertEqual(self.client.get('/api/orders/dispatch/').status_code, 403)
+
+    def test_cache_is_bounded_and_expires(self):
+        tokens = [Token.objects.create(user=User.objects.create_user(username=f'user{i}')) for i in range(3)]
+        bounded = TokenCache(maxsize=2, timeout=60)
+        for token in tokens:
+            bounded.set(token, token.user)
+        self.assertIsNone(bounded.get(tokens[0].key))
+        self.assertEqual(bounded.get(tokens[2].key)[0].username, 'user2')
+
+        expiring = TokenCache(maxsize=2, timeout=0)
+        expiring.set(tokens[0], tokens[0].user)
+        self.assertIsNone(expiring.get(tokens[0].key))
+
+
+class CheckoutTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.customer)
+        cls.menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item {i}', price=Decimal('1.25'), featured=False, category=cls.category)
+            for i in range(50)
+        )
+
+    def test_checkout_moves_cart_into_order_in_constant_queries(self):
+        Cart.objects.bulk_create(
+            Cart(user=self.customer, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in self.menu_items
+        )
+        CartSummary.rebuild(self.customer.pk)
+        # auth, roles, savepoint pair, summary, cart read, order insert, items insert,
+        # cart delete, summary reset, sales rollup job insert, items for response
+        with self.assertNumQueries(12):
+            response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['total']), Decimal('125.00'))
+        self.assertEqual(len(response.data['order_items']), 50)
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_checkout_with_empty_cart_creates_no_order(self):
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.data, {"message": "Your cart is empty"})
+        self.assertFalse(Order.objects.exists())
+
+
+class CatalogueCacheTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.manager)
+        MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=True, category=cls.category)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        first = self.client.get('/api/menu-items', {'ordering': 'price'})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        # The token comes from the token cache too; roles are not needed for reads.
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/menu-items', {'ordering': 'price'})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertNotEqual(self.client.get('/api/menu-items', {'ordering': '-price'})['ETag'], first['ETag'])
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.client.get('/api/categories/%d' % self.category.pk)['ETag']
+        response = self.client.get('/api/categories/%d' % self.category.pk, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_cached_reads(self):
+        etag = self.client.get('/api/menu-items')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/menu-items', {
+                'title': 'Soup', 'price': '4.00', 'featured': False, 'category': self.category.pk,
+            })
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    @override_settings(CATALOGUE_VERSION_CACHE='shared')
+    def test_version_is_shared_between_workers(self):
+        etag = self.client.get('/api/menu-items')['ETag']
+        self.assertIsNone(cache.get(VERSION_KEY))
+        self.assertIsNotNone(caches['shared'].get(VERSION_KEY))
+        # A write in another worker bumps the shared version; this worker's cached copy is dropped.
+        MenuItem.objects.update(price=Decimal('11.00'))
+        bump_catalogue_version()
+        response = self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['price'], '11.00')
+
+
+class OrderCursorPaginationTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.manager)
+        Order.objects.bulk_create(
+            Order(user=cls.customer, total=Decimal(i % 4)) for i in range(23)
+        )
+
+    def walk(self, url, params=None, key='next'):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [order['id'] for order in response.data['results']]
+            url, params, pages = response.data[key], None, pages + 1
+        return ids, pages
+
+    def test_cursor_walk_visits_every_order_once_in_order(self):
+        ids, pages = self.walk('/api/orders/', {'pagination': 'cursor', 'perpage': 5, 'ordering': 'total'})
+        expected = list(Order.objects.order_by('total', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 5)
+
+    def test_previous_cursor_returns_preceding_page(self):
+        first = self.client.get('/api/orders/', {'pagination': 'cursor', 'perpage': 5})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_cursor_mode_skips_count_query(self):
+        # auth, roles, orders, order items
+        with self.assertNumQueries(4):
+            self.client.get('/api/orders/', {'pagination': 'cursor', 'perpage': 5})
+
+    def test_rejects_unlisted_ordering_and_bad_cursor(self):
+        response = self.client.get('/api/orders/', {'pagination': 'cursor', 'ordering': 'delivery_crew'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/orders/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+    def test_tampered_cursor_values_are_not_found(self):
+        def cursor(position):
+            return urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+
+        for ordering, position in [
+            ('-date', ['notadate', 1]),
+            ('-date', [None, 1]),
+            ('-date', ['2026-01-01', 'x']),
+            ('-date', [{'a': 1}, 1]),
+            ('total', [[1], 1]),
+            ('total', ['1e999999', 1]),
+            ('user', [True, {'a': 1}]),
+        ]:
+            response = self.client.get('/api/orders/', {'ordering': ordering, 'cursor': cursor(position)})
+            self.assertEqual(response.status_code, 404, position)
+        response = self.client.get('/api/orders/', {'ordering': '-date', 'cursor': cursor(['2026-01-01', 1])})
+        self.assertEqual(response.status_code, 200)
+
+class CartBatchTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.customer)
+        cls.menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item {i}', price=Decimal('2.00') + i, featured=False, category=cls.category)
+            for i in range(100)
+        )
+
+    def test_batch_add_update_and_remove_in_one_request(self):
+        first, second, third = self.menu_items[:3]
+        Cart.objects.create(user=self.customer, menuitem=first, quantity=1, unit_price=first.price, price=first.price)
+        Cart.objects.create(user=self.customer, menuitem=third, quantity=1, unit_price=third.price, price=third.price)
+        CartSummary.rebuild(self.customer.pk)
+
+        response = self.client.post('/api/cart/menu-items/', [
+            {'menuitem': first.id, 'quantity': 2},
+            {'menuitem': second.id, 'quantity': 5, 'action': 'update'},
+            {'menuitem': third.id, 'action': 'remove'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        cart = {row.menuitem_id: row for row in Cart.objects.filter(user=self.customer)}
+        self.assertEqual(set(cart), {first.id, second.id})
+        self.assertEqual(cart[first.id].quantity, 3)
+        self.assertEqual(cart[first.id].price, first.price * 3)
+        self.assertEqual(cart[second.id].price, second.price * 5)
+
+        summary = self.client.get('/api/cart/summary/').data
+        self.assertEqual(summary['item_count'], 8)
+        self.assertEqual(Decimal(summary['total']), first.price * 3 + second.price * 5)
+
+    def test_batch_query_count_does_not_grow_with_items(self):
+        payload = [{'menuitem': item.id, 'quantity': 1} for item in self.menu_items]
+        # auth, menu items, savepoint pair, existing rows, upsert, summary update + create, cart read
+        with self.assertNumQueries(9):
+            response = self.client.post('/api/cart/menu-items/', payload, format='json')
+        self.assertEqual(len(response.data), 100)
+
+    def test_batch_reports_per_row_errors_and_writes_nothing(self):
+        response = self.client.post('/api/cart/menu-items/', [
+            {'menuitem': self.menu_items[0].id, 'quantity': 1},
+            {'menuitem': 999999, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('menuitem', response.data['items'][1])
+        self.assertFalse(Cart.objects.exists())
+
+
+class CartSummaryTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.customer)
+        cls.pasta = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+        cls.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), featured=False, category=cls.category)
+
+    def summary(self):
+        data = self.client.get('/api/cart/summary/').data
+        return data['item_count'], Decimal(data['total'])
+
+    def test_unit_price_comes_from_the_menu(self):
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.id, 'quantity': 2, 'unit_price': '0.01'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['unit_price']), Decimal('9.50'))
+        self.assertEqual(Decimal(response.data['price']), Decimal('19.00'))
+        self.assertEqual(self.summary(), (2, Decimal('19.00')))
+
+    def test_summary_follows_every_cart_mutation(self):
+        self.assertEqual(self.summary(), (0, Decimal('0')))
+        self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.id, 'quantity': 1})
+        self.client.post('/api/cart/menu-items/', [{'menuitem': self.soup.id, 'quantity': 3}], format='json')
+        self.assertEqual(self.summary(), (4, Decimal('21.50')))
+
+        self.soup.delete()
+        self.assertEqual(self.summary(), (1, Decimal('9.50')))
+
+        self.client.delete('/api/cart/menu-items/')
+        self.assertEqual(self.summary(), (0, Decimal('0')))
+
+
+class ExplainQueriesTests(LittleLemonTestCase):
+    def explain(self, **options):
+        stdout = StringIO()
+        call_command('explain_queries', no_color=True, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_reports_the_plans_on_the_test_database(self):
+        report = self.explain()
+        self.assertTrue(report.rstrip().endswith("13 queries on sqlite, 1 with full scans."))
+        self.assertIn("orders: detail\n", report)
+        self.assertRegex(report, r"orders: detail\n    .*SEARCH LittleLemonAPI_order USING INTEGER PRIMARY KEY \(rowid=\?\)")
+        self.assertRegex(report, r"orders: customer list\n    .*SEARCH LittleLemonAPI_order USING INDEX order_user_date_idx \(user_id=\?\)")
+        self.assertRegex(report, r"orders: crew list\n    .*SEARCH LittleLemonAPI_order USING INDEX order_crew_date_idx \(delivery_crew_id=\?\)")
+        self.assertRegex(report, r"menu items: list  \[FULL SCAN\]\n    .*SCAN LittleLemonAPI_menuitem\n")
+
+    def test_fail_on_scan(self):
+        with self.assertRaisesMessage(CommandError, "1 queries do full table scans."):
+            self.explain(fail_on_scan=True)
+
+
+@override_settings(THROTTLE_CACHE='throttle')
+class SlidingWindowThrottleTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.customer)
+
+    def test_database_cache_increments_in_place(self):
+        throttle_cache = caches['throttle']
+        throttle_cache.set('counter', 1)
+        self.assertEqual(throttle_cache.incr('counter'), 2)
+        self.assertEqual(throttle_cache.incr('counter', 5), 7)
+        self.assertEqual(throttle_cache.decr('counter'), 6)
+        self.assertEqual(throttle_cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            throttle_cache.incr('missing')
+
+    def test_counters_are_not_culled_past_the_default_limit(self):
+        # DatabaseCache culls a third of its entries beyond 300 unless MAX_ENTRIES says otherwise.
+        caches['shared'].set(VERSION_KEY, 'v1', None)
+        throttle_cache = caches['throttle']
+        throttle_cache.set_many({f'throttle_user_{i}': [i] for i in range(400)}, 60)
+        self.assertEqual(len(throttle_cache.get_many([f'throttle_user_{i}' for i in range(400)])), 400)
+        self.assertEqual(caches['shared'].get(VERSION_KEY), 'v1')
+
+    def test_scoped_rate_is_enforced_through_the_shared_cache(self):
+        with mock.patch.dict(UserThrottle.THROTTLE_RATES, {'menu_read': '3/minute', 'user': '100/minute'}):
+            statuses = [self.client.get('/api/categories').status_code for _ in range(4)]
+            self.assertEqual(statuses, [200, 200, 200, 429])
+            self.assertIn('Retry-After', self.client.get('/api/categories'))
+            # Other scopes keep their own counters.
+            self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+        # One integer counter per window, not a timestamp per request.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM littlelemon_throttle WHERE cache_key LIKE %s", ['%throttle_menu_read_%'])
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class CartReadTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = User.objects.create_user(username='other', password='admin@123')
+        cls.token = Token.objects.create(user=cls.customer)
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item {i}', price=Decimal('3.00'), featured=False, category=cls.category)
+            for i in range(12)
+        )
+        Cart.objects.bulk_create(
+            Cart(user=user, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for user in (cls.customer, other)
+            for item in menu_items
+        )
+
+    def test_get_returns_only_the_callers_cart(self):
+        response = self.client.get('/api/cart/menu-items/')
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual({row['user'] for row in response.data}, {self.customer.pk})
+
+    def test_expanded_cart_joins_menu_items_in_one_query(self):
+        # auth, cart rows joined to menu items
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cart/menu-items/', {'expand': 'menuitem'})
+        self.assertEqual(response.data[0]['menuitem'], {'id': response.data[0]['menuitem']['id'], 'title': 'Item 0', 'price': '3.00'})
+
+    def test_cart_can_be_paged(self):
+        response = self.client.get('/api/cart/menu-items/', {'perpage': 5, 'page': 3})
+        self.assertEqual(len(response.data), 2)
+
+
+class SalesRollupTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew = User.objects.create_user(username='crew', password='admin@123')
+        cls.crew.groups.add(cls.crew_group)
+        cls.pasta = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+        cls.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), featured=False, category=cls.category)
+
+    def setUp(self):
+        super().setUp()
+        self.clients = {}
+        for user in (self.manager, self.crew, self.customer):
+            self.clients[user.username] = APIClient()
+            self.clients[user.username].force_authenticate(user)
+
+    def checkout(self, *lines):
+        self.clients['customer'].post('/api/cart/menu-items/', [
+            {'menuitem': item.id, 'quantity': quantity} for item, quantity in lines
+        ], format='json')
+        return self.clients['customer'].post('/api/orders/').data['id']
+
+    def reports(self):
+        manager = self.clients['manager']
+        return (
+            manager.get('/api/reports/sales/').data,
+            manager.get('/api/reports/menu-items/').data,
+            manager.get('/api/reports/delivery-crew/').data,
+        )
+
+    def test_rollups_follow_order_lifecycle_and_match_backfill(self):
+        first = self.checkout((self.pasta, 2), (self.soup, 1))
+        second = self.checkout((self.soup, 3))
+        third = self.checkout((self.pasta, 1))
+        self.clients['manager'].patch(f'/api/orders/{first}', {'username': 'crew'})
+        self.clients['manager'].patch(f'/api/orders/{second}', {'username': 'crew'})
+        self.clients['crew'].patch(f'/api/orders/{first}')
+        self.clients['crew'].patch(f'/api/orders/{first}')
+        self.clients['crew'].patch(f'/api/orders/{second}')
+        self.clients['manager'].delete(f'/api/orders/{second}')
+        # The rollups are updated by the job worker.
+        self.assertEqual(Job.objects.count(), 7)
+        self.assertEqual(jobs.run_pending(), (7, 0))
+
+        sales, menu_items, crew = self.reports()
+        self.assertEqual((sales['revenue'], sales['order_count']), ('32.50', 2))
+        self.assertEqual(
+            [(row['title'], row['quantity'], row['revenue']) for row in menu_items],
+            [('Pasta', 3, '28.50'), ('Soup', 1, '4.00')]
+        )
+        self.assertEqual([(row['username'], row['delivered']) for row in crew], [('crew', 1)])
+
+        incremental = self.reports()
+        call_command('backfill_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.reports(), incremental)
+        self.assertTrue(Order.objects.filter(id=third).exists())
+
+    def test_reports_are_manager_only_and_validate_range(self):
+        self.assertEqual(self.clients['customer'].get('/api/reports/sales/').status_code, 403)
+        response = self.clients['manager'].get('/api/reports/sales/', {'from': '2024-02-01', 'to': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.clients['manager'].get('/api/reports/sales/', {'from': '2024-01-01', 'to': '2024-01-31'})
+        self.assertEqual(response.data, {'from': '2024-01-01', 'to': '2024-01-31', 'revenue': '0.00', 'order_count': 0, 'days': []})
+
+
+@override_settings(ORDER_EXPORT_CHUNK_SIZE=2)
+class OrderExportTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew = User.objects.create_user(username='crew', password='admin@123')
+        pasta = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+        orders = Order.objects.bulk_create(
+            Order(user=cls.customer, total=Decimal('9.50') * i, delivery_crew=cls.crew if i % 2 else None, status=i == 1)
+            for i in range(5)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem=pasta, quantity=i, unit_price=Decimal('9.50'), price=Decimal('9.50') * i)
+            for i, order in enumerate(orders) if i
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_lines_match_order_serializer(self):
+        lines = self.export(type='ndjson').splitlines()
+        orders = Order.objects.with_details().order_by('date', 'id')
+        self.assertEqual(lines, [JSONRenderer().render(OrderSerializer(order).data).decode() for order in orders])
+
+    def test_csv_has_a_row_per_order_item(self):
+        rows = list(csv.DictReader(StringIO(self.export())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['order_item_id'], '')
+        self.assertEqual(
+            [(row['status'], row['delivery_crew'], row['quantity'], row['price']) for row in rows[1:3]],
+            [('1', str(self.crew.id), '1', '9.50'), ('0', '', '2', '19.00')]
+        )
+
+    def test_filters(self):
+        self.assertEqual(len(self.export(type='ndjson', delivery_crew=self.crew.id).splitlines()), 2)
+        self.assertEqual(len(self.export(type='ndjson', status=1).splitlines()), 1)
+        self.assertEqual(len(self.export(type='ndjson', status=0).splitlines()), 4)
+        self.assertEqual(self.export(type='ndjson', **{'from': '2000-01-01', 'to': '2000-12-31'}), '')
+
+    def test_items_are_prefetched_per_chunk(self):
+        response = self.client.get('/api/orders/export/', {'type': 'ndjson'})
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        # One query for the orders, then one order_items prefetch per chunk of 2.
+        self.assertEqual(len(queries), 1 + 3)
+
+    def test_manager_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+
+class MenuImportTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pasta = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+        cls.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), featured=False, category=cls.category)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def test_upserts_categories_and_menu_items(self):
+        self.client.get('/api/menu-items')
+        etag = self.client.get('/api/menu-items')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/menu-items/import', {
+                'categories': [{'slug': 'mains', 'title': 'Main courses'}, {'slug': 'desserts', 'title': 'Desserts'}],
+                'menu_items': [
+                    {'id': self.pasta.id, 'title': 'Pasta', 'price': '10.00', 'featured': True, 'category': 'mains'},
+                    {'title': 'Soup', 'price': '4.50', 'featured': False, 'category': 'mains'},
+                    {'title': 'Cake', 'price': '5.00', 'featured': False, 'category': 'desserts'},
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'categories_created': 1, 'categories_updated': 1, 'menu_items_created': 1, 'menu_items_updated': 2,
+        })
+        self.pasta.refresh_from_db()
+        self.soup.refresh_from_db()
+        self.assertEqual((self.pasta.price, self.pasta.featured), (Decimal('10.00'), True))
+        self.assertEqual(self.soup.price, Decimal('4.50'))
+        self.assertEqual(MenuItem.objects.get(title='Cake').category.slug, 'desserts')
+        self.assertEqual(Category.objects.get(slug='mains').title, 'Main courses')
+        # bulk writes skip the signals, so the import bumps the catalogue version itself.
+        self.assertNotEqual(self.client.get('/api/menu-items')['ETag'], etag)
+
+    def test_invalid_rows_are_reported_and_nothing_is_written(self):
+        response = self.client.post('/api/menu-items/import', [
+            {'title': 'Cake', 'price': '5.00', 'featured': False, 'category': 'mains'},
+            {'title': 'Pie', 'price': 'cheap', 'featured': False, 'category': 'mains'},
+            {'title': 'Tart', 'price': '3.00', 'featured': False, 'category': 'nope'},
+            {'id': 999, 'title': 'Ghost', 'price': '1.00', 'featured': False, 'category': 'mains'},
+            {'title': 'Soup', 'price': '4.50', 'featured': False, 'category': 'mains'},
+            {'id': self.soup.id, 'title': 'Soup', 'price': '4.50', 'featured': False, 'category': 'mains'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(error['row'], sorted(error)[0]) for error in response.data['menu_items']], [
+            (1, 'price'), (2, 'category'), (3, 'id'), (5, 'non_field_errors'),
+        ])
+        self.assertFalse(MenuItem.objects.filter(title='Cake').exists())
+
+    def test_command_reads_csv(self):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + '/menu.csv'
+        rows = ['title,price,featured,category,category_title'] + [
+            f'Special {i},{i}.25,{i % 2},specials,Specials' for i in range(1, 1001)
+        ]
+        with open(path, 'w') as file:
+            file.write('\n'.join(rows))
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_menu', path, stdout=StringIO())
+        self.assertEqual(MenuItem.objects.filter(category__slug='specials').count(), 1000)
+        self.assertEqual(MenuItem.objects.get(title='Special 3').price, Decimal('3.25'))
+        # Batched: a few lookups plus two inserts of 500 rows, not a query per row.
+        self.assertLess(len(queries), 15)
+
+    def test_manager_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.post('/api/menu-items/import', [], format='json').status_code, 403)
+
+
+class MenuSearchTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pizzas = Category.objects.create(slug='pizzas', title='Pizzas')
+        cls.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        cls.margherita = MenuItem.objects.create(title='Margherita Pizza', price=Decimal('8.00'), featured=True, category=cls.pizzas)
+        cls.pepperoni = MenuItem.objects.create(title='Pepperoni Pizza', price=Decimal('11.00'), featured=False, category=cls.pizzas)
+        cls.bread = MenuItem.objects.create(title='Garlic Bread', price=Decimal('4.00'), featured=False, category=cls.pizzas)
+        cls.tiramisu = MenuItem.objects.create(title='Tiramisu', price=Decimal('6.50'), featured=True, category=cls.desserts)
+        cls.pizzelle = MenuItem.objects.create(title='Pizzelle', price=Decimal('3.00'), featured=False, category=cls.desserts)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.customer)
+
+    def titles(self, **params):
+        return [item['title'] for item in self.client.get('/api/menu-items/search', params).data['results']]
+
+    def test_prefix_matching_ranks_titles_over_categories(self):
+        self.assertTrue(search.fts_available())
+        self.assertEqual(self.titles(q='marg'), ['Margherita Pizza'])
+        self.assertEqual(self.titles(q='MARGHERITA piz'), ['Margherita Pizza'])
+        self.assertEqual(self.titles(q='pizz')[-1], 'Garlic Bread')
+        self.assertEqual(set(self.titles(q='pizz')[:-1]), {'Margherita Pizza', 'Pepperoni Pizza', 'Pizzelle'})
+        self.assertEqual(self.titles(q='"pepp*)('), ['Pepperoni Pizza'])
+        self.assertEqual(self.titles(q='lasagne'), [])
+
+    def test_facets_exclude_their_own_filter(self):
+        response = self.client.get('/api/menu-items/search', {'q': 'pizz', 'category': 'pizzas', 'price': '5-10'})
+        self.assertEqual([item['title'] for item in response.data['results']], ['Margherita Pizza'])
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['facets'], {
+            'category': [{'slug': 'pizzas', 'title': 'Pizzas', 'count': 1}],
+            'featured': {'true': 1, 'false': 0},
+            'price': [{'band': '0-5', 'count': 1}, {'band': '5-10', 'count': 1}, {'band': '10-20', 'count': 1}, {'band': '20+', 'count': 0}],
+        })
+        self.assertEqual(self.titles(featured='true'), ['Margherita Pizza', 'Tiramisu'])
+        self.assertEqual(self.client.get('/api/menu-items/search', {'price': '1-2'}).status_code, 400)
+
+    def test_index_follows_writes(self):
+        MenuItem.objects.filter(pk=self.bread.pk).update(title='Focaccia')
+        self.pizzas.title = 'Flatbreads'
+        self.pizzas.save()
+        self.tiramisu.delete()
+        MenuItem.objects.bulk_create([MenuItem(title='Panna Cotta', price=Decimal('5.00'), featured=False, category=self.desserts)])
+        self.assertEqual(self.titles(q='foc'), ['Focaccia'])
+        self.assertEqual(len(self.titles(q='flatbread')), 3)
+        self.assertEqual(self.titles(q='tira'), [])
+        self.assertEqual(self.titles(q='panna'), ['Panna Cotta'])
+
+    def test_fallback_without_index(self):
+        with mock.patch.object(search, 'fts_available', return_value=False):
+            self.assertEqual(self.titles(q='marg'), ['Margherita Pizza'])
+            self.assertEqual(set(self.titles(q='pizz')), {'Margherita Pizza', 'Pepperoni Pizza', 'Pizzelle', 'Garlic Bread'})
+            self.assertEqual(self.titles(q='pizz')[-1], 'Garlic Bread')
+
+    def test_pages_are_fetched_in_sql(self):
+        MenuItem.objects.bulk_create(
+            MenuItem(title=f'Pizza {name}', price=Decimal('9.00'), featured=False, category=self.pizzas)
+            for name in ('Bianca', 'Diavola', 'Funghi')
+        )
+        for fts in (True, False):
+            with mock.patch.object(search, 'fts_available', return_value=fts):
+                first = self.titles(q='pizz')
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get('/api/menu-items/search', {'q': 'pizz', 'page': 2})
+            self.assertEqual(response.data['count'], 7)
+            self.assertEqual(len(first), 5)
+            second = [item['title'] for item in response.data['results']]
+            self.assertEqual(len(second), 2)
+            self.assertFalse(set(first) & set(second))
+            # The last page is trimmed to the rows left: LIMIT 2 OFFSET 5.
+            self.assertTrue(any(re.search(r'ORDER BY .* LIMIT 2 OFFSET 5', query['sql']) for query in queries), fts)
+
+    def test_facets_are_cached_until_the_catalogue_changes(self):
+        self.client.get('/api/menu-items/search', {'q': 'pizz'})
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get('/api/menu-items/search', {'q': 'pizz'})
+        with CaptureQueriesContext(connection) as uncached:
+            self.client.get('/api/menu-items/search', {'q': 'pizza'})
+        self.assertEqual(len(uncached) - len(cached), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(title='Pizza Bianca', price=Decimal('25.00'), featured=False, category=self.pizzas)
+        response = self.client.get('/api/menu-items/search', {'q': 'pizz'})
+        self.assertEqual(response.data['facets']['price'][-1], {'band': '20+', 'count': 1})
+
+
+@override_settings(SERVER_TIMING_HEADER=True, SLOW_REQUEST_THRESHOLD_MS=None)
+class PerformanceMiddlewareTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.manager)
+        MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+
+    def setUp(self):
+        super().setUp()
+        instrumentation.registry.reset()
+
+    def test_records_endpoint_metrics_and_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        # The query log is reset when the next request starts.
+        query_count = len(queries)
+        timings = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'auth', 'permission', 'throttle', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{query_count} queries"', timings['db'])
+
+        metrics = self.client.get('/api/metrics/').content.decode()
+        labels = 'method="GET",route="api/orders/"'
+        self.assertIn(f'littlelemon_request_duration_seconds_count{{{labels}}} 1\n', metrics)
+        self.assertIn(f'littlelemon_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n', metrics)
+        self.assertIn(f'littlelemon_requests_total{{{labels},status="200"}} 1\n', metrics)
+        self.assertIn(f'littlelemon_db_queries_total{{{labels}}} {query_count}\n', metrics)
+        self.assertIn(f'littlelemon_phase_duration_seconds_total{{{labels},phase="serialize"}}', metrics)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_log_their_sql(self):
+        with self.assertLogs('LittleLemonAPI.slow_requests', 'WARNING') as logs:
+            self.client.get('/api/menu-items')
+        self.assertIn('Slow request: GET /api/menu-items', logs.output[0])
+        self.assertIn('FROM "LittleLemonAPI_menuitem"', logs.output[0])
+        # The token lookup is logged without its parameters.
+        self.assertIn('FROM "authtoken_token"', logs.output[0])
+        self.assertNotIn(self.token.key, logs.output[0])
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_log_leaves_out_the_query_string(self):
+        with self.assertLogs('LittleLemonAPI.slow_requests', 'WARNING') as logs:
+            self.client.get('/api/menu-items/search', {'q': 'secretterm', 'category': 'mains'})
+        record = logs.records[0]
+        self.assertIn('Slow request: GET /api/menu-items/search took', record.getMessage())
+        self.assertNotIn('secretterm', record.getMessage())
+        self.assertNotIn('secretterm', repr(vars(record)))
+
+    def test_only_this_apps_views_are_timed(self):
+        response = self.client.get('/api/cart/summary/')
+        self.assertIn('auth;dur=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('auth;dur=', response['Server-Timing'])
+
+    def test_metrics_are_manager_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+
+class BenchmarkSuiteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.generate(customers=20, crew=3, managers=1, categories=2, menu_items=30, orders=60, carts=5)
+
+    def test_runs_every_scenario_and_rolls_back(self):
+        orders = Order.objects.count()
+        stdout = StringIO()
+        call_command('benchmark', requests=5, warmup=1, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['data']['orders'], 60)
+        self.assertEqual(list(report['scenarios']), [scenario.name for scenario in benchmarks.SCENARIOS])
+        for name, result in report['scenarios'].items():
+            self.assertEqual((result['requests'], result['errors']), (5, 0), name)
+            self.assertGreater(result['queries_per_request'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertEqual(Order.objects.count(), orders)
+
+    def test_clear_keeps_other_users_orders(self):
+        customer = User.objects.create_user(username='customer', password='admin@123')
+        item = MenuItem.objects.filter(category__slug__startswith=benchmarks.PREFIX).first()
+        order = Order.objects.create(user=customer, total=item.price)
+        OrderItem.objects.create(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+        benchmarks.clear()
+        self.assertEqual(list(order.order_items.values_list('menuitem_id', flat=True)), [item.id])
+        self.assertEqual(list(MenuItem.objects.values_list('id', flat=True)), [item.id])
+        self.assertEqual(Order.objects.get().id, order.id)
+        self.assertEqual(benchmarks.counts()['customers'], 0)
+
+    def test_rolled_back_discards_the_block_however_it_ends(self):
+        orders = Order.objects.count()
+        with benchmarks.rolled_back():
+            Order.objects.all().delete()
+        with self.assertRaises(ZeroDivisionError), benchmarks.rolled_back():
+            Order.objects.all().delete()
+            1 / 0
+        self.assertEqual(Order.objects.count(), orders)
+
+    def test_compare_reports_regressions(self):
+        baseline = {'scenarios': {'checkout': {'p95_ms': 10.0, 'queries_per_request': 12, 'errors': 0}}}
+        same = {'scenarios': {'checkout': {'p95_ms': 11.0, 'queries_per_request': 12.4, 'errors': 0}}}
+        worse = {'scenarios': {'checkout': {'p95_ms': 15.0, 'queries_per_request': 20, 'errors': 1}}}
+        self.assertEqual(benchmarks.compare(baseline, same), [])
+        self.assertEqual(len(benchmarks.compare(baseline, worse)), 3)
+
+
+class DispatchTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew = [User.objects.create_user(username=f'crew{i}', password='admin@123') for i in range(3)]
+        for member in cls.crew:
+            member.groups.add(cls.crew_group)
+        # crew0 already has three pending orders and crew1 one; delivered orders do not count.
+        Order.objects.bulk_create(
+            [Order(user=cls.customer, total=Decimal('5.00'), delivery_crew=cls.crew[0]) for _ in range(3)] +
+            [Order(user=cls.customer, total=Decimal('5.00'), delivery_crew=cls.crew[1])] +
+            [Order(user=cls.customer, total=Decimal('5.00'), delivery_crew=cls.crew[2], status=True) for _ in range(4)]
+        )
+        cls.pending = Order.objects.bulk_create(Order(user=cls.customer, total=Decimal('5.00')) for _ in range(6))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def loads(self, data):
+        return {member['username']: member['load'] for member in data['delivery_crew']}
+
+    def test_auto_assign_balances_by_load_in_one_update(self):
+        self.assertEqual(self.client.get('/api/orders/dispatch/').data['pending'], 6)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/dispatch/', {'auto': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.loads(response.data), {'crew0': 4, 'crew1': 3, 'crew2': 3})
+        self.assertEqual(len(response.data['assigned']), 6)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+        self.assertEqual(self.loads(self.client.get('/api/orders/dispatch/').data), {'crew0': 4, 'crew1': 3, 'crew2': 3})
+
+    def test_auto_assign_limit_and_crew_subset(self):
+        response = self.client.post(
+            '/api/orders/dispatch/', {'auto': True, 'limit': 2, 'delivery_crew': ['crew0', 'crew1']}, format='json'
+        )
+        self.assertEqual(
+            [(row['order'], row['delivery_crew']) for row in response.data['assigned']],
+            [(self.pending[0].id, self.crew[1].id), (self.pending[1].id, self.crew[1].id)]
+        )
+
+    def test_explicit_assignments_report_per_row_errors(self):
+        response = self.client.post('/api/orders/dispatch/', {'assignments': [
+            {'order': self.pending[0].id, 'delivery_crew': 'crew2'},
+            {'order': self.pending[0].id - 1, 'delivery_crew': 'crew2'},
+            {'order': self.pending[1].id, 'delivery_crew': 'customer'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([sorted(error) for error in response.data['assignments']], [[], ['order'], ['delivery_crew']])
+
+        response = self.client.post('/api/orders/dispatch/', {'assignments': [
+            {'order': self.pending[0].id, 'delivery_crew': 'crew2'},
+            {'order': self.pending[1].id, 'delivery_crew': 'crew0'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(id=self.pending[1].id).delivery_crew, self.crew[0])
+        self.assertEqual(self.loads(response.data), {'crew0': 4, 'crew1': 1, 'crew2': 1})
+
+    def test_manager_only(self):
+        self.client.force_authenticate(self.crew[0])
+        self.assertEqual(self.client.post('/api/orders/dispatch/', {'auto': True}, format='json').status_code, 403)
+
+
+class RecordingBroker(events.Broker):
+    published = []
+
+    def publish(self, channels, message):
+        self.published.append((set(channels), message))
+
+
+@override_settings(ORDER_EVENTS_BACKEND='LittleLemonAPI.tests.RecordingBroker')
+class OrderEventTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew = User.objects.create_user(username='crew', password='admin@123')
+        cls.crew.groups.add(cls.crew_group)
+        cls.crew_token = Token.objects.create(user=cls.crew)
+        cls.order = Order.objects.create(user=cls.customer, total=Decimal('5.00'))
+
+    def setUp(self):
+        super().setUp()
+        RecordingBroker.published = []
+
+    def test_only_the_stream_is_served_under_async(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/async/menu-items').status_code, 404)
+        self.assertEqual(self.client.get('/api/async/orders/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/async/orders/events').status_code, 401)
+
+    def test_patches_publish_to_customer_crew_and_managers_on_commit(self):
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/orders/{self.order.id}', {'username': 'crew'})
+            self.assertEqual(RecordingBroker.published, [])
+        self.client.force_authenticate(self.crew)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/orders/{self.order.id}')
+            self.client.patch(f'/api/orders/{self.order.id}')
+
+        channels = {'managers', f'user:{self.customer.id}', f'user:{self.crew.id}'}
+        self.assertEqual(RecordingBroker.published, [
+            (channels, {'id': self.order.id, 'user': self.customer.id, 'delivery_crew': self.crew.id, 'status': False}),
+            (channels, {'id': self.order.id, 'user': self.customer.id, 'delivery_crew': self.crew.id, 'status': True}),
+        ])
+
+    def test_dispatch_publishes_each_assignment(self):
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/orders/dispatch/', {'auto': True}, format='json')
+        self.assertEqual([message['delivery_crew'] for _, message in RecordingBroker.published], [self.crew.id])
+
+    @override_settings(ORDER_EVENTS_BACKEND='LittleLemonAPI.events.InProcessBroker', ORDER_EVENTS_HEARTBEAT=0.05)
+    async def test_stream_delivers_events_for_the_caller(self):
+        response = await self.async_client.get(
+            '/api/async/orders/events', headers={'Authorization': f'Token {self.crew_token.key}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 2000\n\n')
+        self.assertEqual(await anext(stream), b': keep-alive\n\n')
+
+        broker = events.get_broker()
+        broker.publish(['user:0'], {'id': 1})
+        broker.publish([f'user:{self.crew.id}', 'managers'], {'id': self.order.id, 'status': True})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(chunk, b'event: order\ndata: {"id": %d, "status": true}\n\n' % self.order.id)
+        await stream.aclose()
+
+
+class IdempotencyTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.item = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.customer)
+
+    def add_to_cart(self, key=None, quantity=1):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/cart/menu-items/', [{'menuitem': self.item.id, 'quantity': quantity}], format='json', **headers)
+
+    def test_retried_checkout_replays_the_first_order(self):
+        self.add_to_cart()
+        first = self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(first.status_code, 200)
+        self.add_to_cart()
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual((retry.status_code, retry.data), (200, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 1)
+        self.assertFalse(any('"LittleLemonAPI_cart' in query['sql'] or '"LittleLemonAPI_order' in query['sql'] for query in queries))
+
+        self.assertEqual(self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-2').status_code, 200)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_cart_mutations_are_replayed_and_keys_are_bound_to_the_request(self):
+        self.assertEqual(self.add_to_cart('add-1').status_code, 200)
+        self.assertEqual(self.add_to_cart('add-1').status_code, 200)
+        self.assertEqual(Cart.objects.get(user=self.customer).quantity, 1)
+        response = self.add_to_cart('add-1', quantity=3)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.client.get('/api/cart/menu-items/', HTTP_IDEMPOTENCY_KEY='add-1').status_code, 200)
+
+    def test_failed_requests_are_not_stored(self):
+        self.add_to_cart()
+        with mock.patch('LittleLemonAPI.reporting.record_order', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.client.post('/api/orders/', HTTP_IDEMPOTENCY_KEY='checkout-1').status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_expired_keys_run_again_and_are_cleared(self):
+        self.add_to_cart('add-1')
+        IdempotencyKey.objects.update(created=timezone.now() - timedelta(seconds=120))
+        self.add_to_cart('add-1')
+        self.assertEqual(Cart.objects.get(user=self.customer).quantity, 2)
+
+        IdempotencyKey.objects.update(created=timezone.now() - timedelta(seconds=120))
+        self.add_to_cart('add-2')
+        call_command('clear_idempotency_keys', stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['add-2'])
+
+
+class ValuesSerializerTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item "{i}" \u00e9', price=Decimal(i * 7) / 4, featured=i % 2 == 0, category=cls.category)
+            for i in range(6)
+        )
+        orders = Order.objects.bulk_create([
+            Order(user=cls.customer, total=Decimal('10')),
+            Order(user=cls.customer, delivery_crew=cls.manager, status=True, total=Decimal('0.5')),
+            Order(user=cls.customer, total=Decimal('1234.56')),
+        ])
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for order in orders[1:]
+            for item in reversed(menu_items[:4])
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def test_output_is_byte_identical_to_the_model_serializers(self):
+        render = JSONRenderer().render
+        self.assertEqual(
+            render(MenuItemValuesSerializer(MenuItem.objects.order_by('id')).data),
+            render(MenuItemSerializer(MenuItem.objects.order_by('id'), many=True).data),
+        )
+        orders = Order.objects.order_by('id')
+        expected = render(OrderSerializer(orders.with_details(), many=True).data)
+        self.assertEqual(render(OrderValuesSerializer(orders).data), expected)
+        self.assertEqual(render(OrderValuesSerializer(list(orders)).data), expected)
+        self.assertEqual(render(OrderValuesSerializer(list(OrderValuesSerializer.rows(orders))).data), expected)
+
+    def test_list_endpoints_use_one_query_per_level(self):
+        response = self.client.get('/api/orders/', {'perpage': 3, 'ordering': 'id'})
+        self.assertEqual(response.content, JSONRenderer().render(
+            OrderSerializer(Order.objects.with_details().order_by('id'), many=True).data
+        ))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/orders/', {'perpage': 3, 'pagination': 'cursor'})
+        # the orders page and its order items (roles are cached on the forced user)
+        self.assertEqual(len(queries), 2)
+        response = self.client.get('/api/menu-items', {'ordering': '-price'})
+        self.assertEqual(
+            response.data['results'], MenuItemSerializer(MenuItem.objects.order_by('-price')[:5], many=True).data
+        )
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class ResponseEncodingTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        MenuItem.objects.bulk_create(
+            MenuItem(title=f'Item {i} \u00e9', price=Decimal('2.50'), featured=False, category=cls.category)
+            for i in range(10)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'caf\u00e9 "quoted" \u2028\u2029 \U0001f34b',
+            'decimal': Decimal('12.30'),
+            'date': date(2023, 5, 17),
+            'datetime': datetime(2023, 5, 17, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'numbers': [0, -1, 2.5, True, None],
+            'big': 2 ** 70,
+        }
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b'')
+
+    def test_negotiates_the_preferred_encoding(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0, deflate'), None)
+        self.assertEqual(negotiate_encoding('*;q=0.5'), 'gzip' if brotli is None else 'br')
+        self.assertEqual(negotiate_encoding(''), None)
+
+    def test_large_responses_are_compressed_when_accepted(self):
+        plain = self.client.get('/api/menu-items')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/menu-items', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(
+            self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+        )
+
+    def test_gzip_bodies_are_padded_against_breach(self):
+        # GZipMiddleware sets FNAME and stores a random-length file name in the header.
+        response = self.client.get('/api/menu-items', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.content[3] & gzip.FNAME)
+        self.assertNotIn('Content-Encoding', self.client.get('/api/menu-items', HTTP_ACCEPT_ENCODING='gzip;q=0'))
+
+    def test_brotli_is_preferred_when_installed(self):
+        fake_brotli = mock.Mock(compress=lambda content, quality: b'br:' + content[:10])
+        with mock.patch('LittleLemonAPI.middleware.brotli', fake_brotli):
+            response = self.client.get('/api/menu-items', HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertTrue(response.content.startswith(b'br:'))
+            self.assertEqual(int(response['Content-Length']), len(response.content))
+            self.assertEqual(
+                self.client.get('/api/menu-items', HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')['Content-Encoding'], 'gzip'
+            )
+
+    def test_small_and_streaming_responses_are_not_compressed(self):
+        response = self.client.get(f'/api/menu-items/{MenuItem.objects.first().id}', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/api/orders/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Content-Encoding', response)
+
+
+# 'replica1' is a separate SQLite test database that nothing replicates into, so
+# rows written to it with different values show which database a request read.
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_CACHE='default')
+class ReplicaRoutingTests(LittleLemonTestCase):
+    databases = {'default', 'replica1', 'replica2'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew = User.objects.create_user(username='crew', password='admin@123')
+        cls.crew.groups.add(cls.crew_group)
+        cls.item = MenuItem.objects.create(title='Pasta', price=Decimal('10.00'), featured=False, category=cls.category)
+        cls.order = Order.objects.create(user=cls.customer, total=Decimal('10.00'))
+
+        # The replica lags behind: same rows, older values.
+        for obj in (cls.manager, cls.crew, cls.customer, cls.category, cls.item, cls.order):
+            stale = copy.copy(obj)
+            if obj is cls.item:
+                stale.title = 'Pasta (stale)'
+            if obj is cls.order:
+                stale.total = Decimal('9.00')
+            type(obj).objects.using('replica1').bulk_create([stale])
+
+    def setUp(self):
+        super().setUp()
+        # A catalogue version older than REPLICATION_LAG_SECONDS.
+        cache.set(VERSION_KEY, (time.time_ns() - 60 * 10 ** 9, int(time.time()) - 60), None)
+
+    def get(self, user, path):
+        self.client.force_authenticate(user)
+        return self.client.get(path)
+
+    def test_safe_requests_read_the_catalogue_and_orders_from_a_replica(self):
+        with CaptureQueriesContext(connections['replica1']) as replica_queries:
+            self.assertEqual(self.get(self.customer, '/api/menu-items').data['results'][0]['title'], 'Pasta (stale)')
+            self.assertEqual(self.get(self.customer, '/api/orders/').data[0]['total'], '9.00')
+        self.assertTrue(replica_queries)
+        with CaptureQueriesContext(connections['replica2']) as unused_queries:
+            self.get(self.customer, '/api/orders/')
+        self.assertFalse(unused_queries)
+        # Outside a request everything stays on the primary.
+        self.assertEqual(MenuItem.objects.get().title, 'Pasta')
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        self.client.force_authenticate(self.manager)
+        with CaptureQueriesContext(connections['replica1']) as replica_queries:
+            response = self.client.patch(f'/api/orders/{self.order.id}', {'username': 'crew'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(replica_queries)
+        self.assertTrue(cache.get(db_router.pin_key(self.manager.id)))
+
+        self.assertEqual(self.get(self.manager, '/api/orders/').data[0]['total'], '10.00')
+        # Other users are not pinned.
+        self.assertEqual(self.get(self.customer, '/api/orders/').data[0]['total'], '9.00')
+
+    def test_catalogue_cache_fills_from_the_primary_after_a_change(self):
+        bump_catalogue_version()
+        self.assertEqual(self.get(self.customer, '/api/menu-items').data['results'][0]['title'], 'Pasta')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        with CaptureQueriesContext(connections['replica1']) as replica_queries:
+            self.assertEqual(self.get(self.customer, '/api/orders/').data[0]['total'], '10.00')
+        self.assertFalse(replica_queries)
+
+
+@jobs.job(max_attempts=2)
+def create_category(slug, fail=False):
+    Category.objects.create(slug=slug, title=slug)
+    if fail:
+        raise RuntimeError('failed on purpose')
+
+
+class JobQueueTests(TestCase):
+    def test_jobs_are_queued_with_the_transaction(self):
+        with transaction.atomic():
+            create_category.enqueue(slug='kept')
+        try:
+            with transaction.atomic():
+                create_category.enqueue(slug='rolled-back')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        stdout = StringIO()
+        call_command('run_jobs', once=True, threads=1, stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "1 jobs succeeded, 0 failed.\n")
+        self.assertEqual(list(Category.objects.values_list('slug', flat=True)), ['kept'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_jobs_are_retried_later_then_kept_as_failed(self):
+        create_category.enqueue(slug='broken', fail=True)
+        with self.assertLogs('LittleLemonAPI.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), (0, 1))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(jobs.run_pending(), (0, 0))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('LittleLemonAPI.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), (0, 1))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('RuntimeError: failed on purpose', job.last_error)
+        self.assertFalse(Category.objects.exists())
+
+    def test_expired_claims_are_taken_over(self):
+        create_category.enqueue(slug='slow')
+        [stale] = jobs.claim(10)
+        self.assertEqual(jobs.claim(10), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        # The first worker finishing late has its work rolled back.
+        with self.assertLogs('LittleLemonAPI.jobs', 'WARNING'):
+            self.assertFalse(jobs.execute(stale))
+        self.assertEqual(Category.objects.count(), 1)
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Sliding-window counter throttle.
+
+    Each key keeps two integers, the request counts of the current and the
+    previous fixed window, and the rate is estimated as
+    previous * (share of the previous window still inside the sliding window) + current.
+    Counters are updated with the cache's add()/incr(), so the limit holds
+    across worker processes when THROTTLE_CACHE points at a shared backend.
+    """
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        if scope != self.scope:
+            self.scope = scope
+            self.rate = self.get_rate()
+            self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = (self.now % self.duration) / self.duration
+        current_key, previous_key = f'{self.key}:{window}', f'{self.key}:{window - 1}'
+        counts = self.cache.get_many([current_key, previous_key])
+        self.previous = counts.get(previous_key, 0)
+        self.current = counts.get(current_key, 0)
+
+        # Over the limit already: refuse without writing anything.
+        if self.estimate(self.current + 1) > self.num_requests:
+            return self.throttle_failure()
+
+        self.current = self.increment(current_key)
+
+        # Another process may have counted requests since the read above.
+        if self.estimate(self.current) > self.num_requests:
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+        return True
+
+    def increment(self, key):
+        if not self.current and self.cache.add(key, 1, self.duration * 2):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between the read and the increment; start a new counter.
+            self.cache.set(key, 1, self.duration * 2)
+            return 1
+
+    def estimate(self, current):
+        return self.previous * (1 - self.elapsed) + current
+
+    def wait(self):
+        remaining = (1 - self.elapsed) * self.duration
+        if self.previous:
+            excess = self.estimate(self.current + 1) - self.num_requests
+            return min(remaining, excess * self.duration / self.previous)
+        return remaining
+
+
+class AnonThrottle(SlidingWindowThrottle, AnonRateThrottle):
+    pass
+
+
+class UserThrottle(SlidingWindowThrottle, UserRateThrottle):
+    """
+    Per-user throttle. Views may set `throttle_scope`; requests then use the
+    '<scope>_read' or '<scope>_write' rate when one is configured.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            scope = f"{scope}_{'read' if request.method in SAFE_METHODS else 'write'}"
+            if scope in self.THROTTLE_RATES:
+                return scope
+        return UserRateThrottle.scope
@@ -7,8 +7,15 @@ router.register('menu-items', views.MenuItemView, basename='menue-items')
 router.register('categories', views.CategoryView, basename='categories')
 urlpatterns = router.urls + [
     path("cart/menu-items/", views.cart_view, name="cart-menus"),
+    path("cart/summary/", views.cart_summary_view, name="cart-summary"),
     path("orders/", views.OrderListViews.as_view(), name="orders-list"),
+    path("orders/dispatch/", views.DispatchView.as_view(), name="orders-dispatch"),
+    path("orders/export/", views.OrderExportView.as_view(), name="orders-export"),
     path("orders/<int:pk>", views.OrderView.as_view(), name="order"),
+    path('reports/sales/', views.SalesReportView.as_view(), name='sales-report'),
+    path('reports/menu-items/', views.MenuItemSalesReportView.as_view(), name='menu-item-sales-report'),
+    path('reports/delivery-crew/', views.DeliveryCrewReportView.as_view(), name='delivery-crew-report'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
     path('groups/manager/users/', views.ManagerViews.as_view(), name='manager-list'),
     path('groups/manager/users/<int:userId>/', views.ManagerViews.as_view(), name='manager-detail'),
     path('groups/delivery-crew/users/', views.DeliveryCrewViews.as_view(), name='crew-list'),
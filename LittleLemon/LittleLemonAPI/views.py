@@ -1,71 +1,144 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import status
-from .serializers import MenuItemSerializer, CategorySerializer, ManagerSerializer, DeliveryCrewSerializer, CartSerializer, OrderSerializer, ManagerOrderSerializer
-from .models import MenuItem, Category, Cart, Order
+from .serializers import MenuItemSerializer, CategorySerializer, ManagerSerializer, DeliveryCrewSerializer, CartSerializer, CartBatchSerializer, CartDetailSerializer, CartSummarySerializer, OrderSerializer, ManagerOrderSerializer
+from .serializers import CrewLoadSerializer, DispatchSerializer, MenuSearchSerializer, OrderExportSerializer, ReportRangeSerializer, SalesReportSerializer, MenuItemSalesSerializer, DeliveryCrewDeliveriesSerializer
+from .models import MenuItem, Category, Cart, CartSummary, Order, OrderItem
 from rest_framework.permissions import IsAuthenticated
-from .custom_permissions import IsManager, is_manager_check, is_crew_check, is_customer_check
+from . import dispatch, events, exports, instrumentation, menu_import, reporting, search
+from .catalogue_cache import CatalogueCacheMixin
+from .fast_serializers import MenuItemValuesSerializer, OrderValuesSerializer, ValuesListMixin
+from .idempotency import idempotent
+from .instrumentation import TimedViewMixin, timed_api_view
+from .pagination import OrderCursorPagination
+from .custom_permissions import IsManager, is_manager_check, is_crew_check, is_customer_check, is_crew
 from django.contrib.auth.models import User, Group
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from django.core.paginator import Paginator, EmptyPage
 from rest_framework.decorators import api_view,throttle_classes
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from .throttling import AnonThrottle, UserThrottle
 
 
-class CategoryView(ModelViewSet):
+class CategoryView(TimedViewMixin, CatalogueCacheMixin, ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     ordering_fields = '__all__'
     search_fields= '__all__'
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    throttle_scope = 'menu'
 
     def get_permissions(self):
         if self.request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
-            self.permission_classes.append(IsManager)
+            return [permission() for permission in self.permission_classes + [IsManager]]
 
         return super(CategoryView, self).get_permissions()
 
-class MenuItemView(ModelViewSet):
+class MenuItemView(TimedViewMixin, CatalogueCacheMixin, ValuesListMixin, ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
+    values_serializer_class = MenuItemValuesSerializer
     permission_classes = [IsAuthenticated]
     ordering_fields = ['id', 'price', 'title', 'category__title']
     search_fields=['title', 'price', 'category__title']
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    throttle_scope = 'menu'
 
     def get_permissions(self):
         if self.request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
-            self.permission_classes.append(IsManager)
+            return [permission() for permission in self.permission_classes + [IsManager]]
 
         return super(MenuItemView, self).get_permissions()
 
-
+    @action(detail=False, methods=['get'], url_path='search')
+    def search_items(self, request):
+        params = MenuSearchSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        menu_search = search.MenuSearch(**params.validated_data)
+        # Only the page of ids is turned into menu items.
+        page = self.paginate_queryset(menu_search.ids())
+        items = MenuItem.objects.in_bulk(page)
+        response = self.get_paginated_response(MenuItemSerializer([items[item_id] for item_id in page], many=True).data)
+        response.data['facets'] = menu_search.facets()
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                data = menu_import.parse(upload.read(), 'csv' if upload.name.lower().endswith('.csv') else 'json')
+            else:
+                data = menu_import.normalize(request.data)
+            result = menu_import.import_menu(data, dry_run=request.query_params.get('dry_run') in ('1', 'true'))
+        except ValueError as exc:
+            return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except menu_import.MenuImportError as exc:
+            return Response(exc.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+@timed_api_view
 @api_view(['GET', 'POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([AnonThrottle, UserThrottle])
+@idempotent
 def cart_view(request):
     if request.method == 'GET':
-        author = Cart.objects.all()
-        serialized_category = CartSerializer(author, many=True)
-        return Response(serialized_category.data)
+        cart = Cart.objects.filter(user__id=request.user.id).order_by('id')
+        serializer_class = CartSerializer
+        if request.query_params.get('expand') == 'menuitem':
+            cart = cart.select_related('menuitem')
+            serializer_class = CartDetailSerializer
+
+        perpage = request.query_params.get('perpage')
+        if perpage:
+            paginator = Paginator(cart, per_page=perpage)
+            try:
+                cart = paginator.page(number=request.query_params.get('page', 1))
+            except EmptyPage:
+                cart = []
+
+        serialized = serializer_class(cart, many=True)
+        return Response(serialized.data)
+    elif request.method == 'POST' and isinstance(request.data, list):
+        batch = CartBatchSerializer(data={'items': request.data}, context={'request': request})
+        batch.is_valid(raise_exception=True)
+        cart = batch.save()
+        return Response(CartSerializer(cart, many=True).data, status=status.HTTP_200_OK)
     elif request.method == 'POST':
         item = CartSerializer(data=request.data, context={'request': request})
         item.is_valid(raise_exception=True)
         item.save()
         return Response(item.data, status=status.HTTP_201_CREATED)
     else:
-        Cart.objects.filter(user__id=request.user.id).delete()
+        with transaction.atomic():
+            Cart.objects.filter(user__id=request.user.id).delete()
+            CartSummary.clear(request.user)
         return Response({"message": "Cart is now empty"}, status=status.HTTP_200_OK)
 
 
-class OrderListViews(APIView):
+@timed_api_view
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([AnonThrottle, UserThrottle])
+def cart_summary_view(request):
+    summary = CartSummary.objects.filter(user=request.user).first() or CartSummary(user=request.user)
+    return Response(CartSummarySerializer(summary).data)
+
+
+class OrderListViews(TimedViewMixin, APIView):
     permission_classes = [IsAuthenticated]
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    throttle_scope = 'orders'
 
     def get(self, request):
+        # List pages are built from .values_list() rows; see fast_serializers.
         orders = Order.objects.all()
         ordering = request.query_params.get('ordering')
         page = request.query_params.get('page', 1)
@@ -75,53 +148,66 @@ class OrderListViews(APIView):
         elif is_crew_check(request):
             orders = orders.filter(delivery_crew__id=request.user.id)
 
+        if 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor':
+            paginator = OrderCursorPagination()
+            orders = paginator.paginate_queryset(orders, request)
+            serialized = OrderValuesSerializer(orders)
+            return paginator.get_paginated_response(serialized.data)
 
         if ordering:
             ordering_fields = ordering.split(',')
             orders = orders.order_by(*ordering_fields)
 
-        paginator = Paginator(orders, per_page=perpage)
+        paginator = Paginator(OrderValuesSerializer.rows(orders), per_page=perpage)
         try:
             orders = paginator.page(number=page)
         except EmptyPage:
             orders = []
 
-        serialized = OrderSerializer(orders, many=True)
+        serialized = OrderValuesSerializer(orders)
         return Response(serialized.data, status=status.HTTP_200_OK)
 
+    @idempotent
     def post(self, request):
         if not is_customer_check(request):
             return Response({"message": "Only Customers can access this"}, status=status.HTTP_403_FORBIDDEN)
         
-        cart_items = Cart.objects.filter(user__id=request.user.id)
-        if not cart_items:
-            return Response({"message": "Your cart is empty"}, status=status.HTTP_200_OK)
-        
-        total = 0
-        order = Order.objects.create(user=request.user, total=total)
-
-        for cart_item in cart_items:
-            order.order_items.create(
-                menuitem=cart_item.menuitem,
-                quantity=cart_item.quantity,
-                unit_price=cart_item.unit_price,
-                price=cart_item.price
+        with transaction.atomic():
+            summary = CartSummary.objects.select_for_update().filter(user=request.user).first()
+            if summary is None or not summary.item_count:
+                return Response({"message": "Your cart is empty"}, status=status.HTTP_200_OK)
+
+            cart_items = list(Cart.objects.filter(user__id=request.user.id))
+            if not cart_items:
+                CartSummary.clear(request.user)
+                return Response({"message": "Your cart is empty"}, status=status.HTTP_200_OK)
+
+            order = Order.objects.create(user=request.user, total=summary.total)
+            order_items = OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order,
+                    menuitem_id=cart_item.menuitem_id,
+                    quantity=cart_item.quantity,
+                    unit_price=cart_item.unit_price,
+                    price=cart_item.price
+                )
+                for cart_item in cart_items
             )
-            total += cart_item.price
+            Cart.objects.filter(user__id=request.user.id).delete()
+            CartSummary.clear(request.user)
+            reporting.record_order(order, order_items)
 
-        order.total = total
-        order.save()   
-        cart_items.delete()
         serialized = OrderSerializer(order)
         return Response(serialized.data, status=status.HTTP_200_OK)
 
-class OrderView(APIView):
+class OrderView(TimedViewMixin, APIView):
     permission_classes = [IsAuthenticated]
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    throttle_scope = 'orders'
 
     def get(self, request, pk):
         try:
-            order = Order.objects.get(id=pk)
+            order = Order.objects.with_details().get(id=pk)
         except Order.DoesNotExist:
             return Response({"message": "Not Found"}, status=status.HTTP_404_NOT_FOUND)
         if is_customer_check(request) and order.user != request.user:
@@ -141,7 +227,9 @@ class OrderView(APIView):
         except Order.DoesNotExist:
             return Response({"message": "Not Found"}, status=status.HTTP_404_NOT_FOUND)
 
-        order.delete()
+        with transaction.atomic():
+            reporting.remove_order(order, order.order_items.all())
+            order.delete()
         return Response({"message": "Ordered Deleted"}, status=status.HTTP_200_OK)
 
 
@@ -164,25 +252,134 @@ class OrderView(APIView):
             except User.DoesNotExist:
                 return Response({"message": "Delivery Crew Not Found"}, status=status.HTTP_404_NOT_FOUND)
 
-            if not delivery_crew.groups.filter(name='Delivery Crew').exists():
+            if not is_crew(delivery_crew):
                 return Response({"message": "The Selected user is not a delivery crew"}, status=status.HTTP_403_FORBIDDEN)
 
-            order.delivery_crew = delivery_crew
-            order.save()
+            with transaction.atomic():
+                previous_crew_id = order.delivery_crew_id
+                if order.status and previous_crew_id != delivery_crew.id:
+                    if previous_crew_id:
+                        reporting.record_delivery(order, previous_crew_id, -1)
+                    reporting.record_delivery(order, delivery_crew.id)
+                order.delivery_crew = delivery_crew
+                order.save()
+                if previous_crew_id != delivery_crew.id:
+                    events.order_changed(order, previous_crew_id)
             return Response({"message": "Deliver Crew Set"}, status=status.HTTP_200_OK)
         
         # Delivery cew
         if order.delivery_crew != request.user:
             return Response({"message": "You are not allowed to access this order"}, status=status.HTTP_403_FORBIDDEN)
         
-        order.status = 1
-        order.save()
+        with transaction.atomic():
+            if not order.status:
+                reporting.record_delivery(order, request.user.id)
+                events.order_changed(order)
+            order.status = 1
+            order.save()
         return Response({"message": "Ordered Delivered"}, status=status.HTTP_200_OK)
 
 
-class ManagerViews(APIView):
+class DispatchView(TimedViewMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    throttle_scope = 'orders'
+
+    def get(self, request):
+        return Response({
+            'pending': dispatch.pending_orders().count(),
+            'delivery_crew': CrewLoadSerializer(dispatch.crew_loads(), many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = DispatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if data['auto']:
+            assigned, crew = dispatch.auto_assign(data.get('orders'), data.get('delivery_crew'), data.get('limit'))
+            if not crew:
+                return Response({"message": "No delivery crew available"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            assigned = dispatch.assign(data['assignments'])
+            crew = dispatch.crew_loads()
+        return Response({
+            'assigned': [{'order': order_id, 'delivery_crew': crew_id} for order_id, crew_id in assigned.items()],
+            'delivery_crew': CrewLoadSerializer(crew, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+
+class OrderExportView(TimedViewMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonThrottle, UserThrottle]
+    content_types = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+    def get(self, request):
+        # .dict() so that a missing ?status= is left out instead of read as False.
+        params = OrderExportSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+        orders = Order.objects.all()
+        if 'date_from' in filters:
+            orders = orders.filter(date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            orders = orders.filter(date__lte=filters['date_to'])
+        if 'status' in filters:
+            orders = orders.filter(status=filters['status'])
+        if 'delivery_crew' in filters:
+            orders = orders.filter(delivery_crew__id=filters['delivery_crew'])
+
+        export_type = filters['type']
+        stream = exports.stream_csv if export_type == 'csv' else exports.stream_ndjson
+        response = StreamingHttpResponse(
+            stream(orders, chunk_size=settings.ORDER_EXPORT_CHUNK_SIZE), content_type=self.content_types[export_type]
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_type}"'
+        return response
+
+
+class SalesReportView(TimedViewMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonThrottle, UserThrottle]
+
+    def get(self, request):
+        date_range = ReportRangeSerializer(data=request.query_params)
+        date_range.is_valid(raise_exception=True)
+        report = reporting.sales_report(**date_range.validated_data)
+        return Response(SalesReportSerializer(report).data, status=status.HTTP_200_OK)
+
+
+class MenuItemSalesReportView(TimedViewMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonThrottle, UserThrottle]
+
+    def get(self, request):
+        date_range = ReportRangeSerializer(data=request.query_params)
+        date_range.is_valid(raise_exception=True)
+        report = reporting.menu_item_report(**date_range.validated_data)
+        return Response(MenuItemSalesSerializer(report, many=True).data, status=status.HTTP_200_OK)
+
+
+class DeliveryCrewReportView(TimedViewMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonThrottle, UserThrottle]
+
+    def get(self, request):
+        date_range = ReportRangeSerializer(data=request.query_params)
+        date_range.is_valid(raise_exception=True)
+        report = reporting.delivery_crew_report(**date_range.validated_data)
+        return Response(DeliveryCrewDeliveriesSerializer(report, many=True).data, status=status.HTTP_200_OK)
+
+
+class MetricsView(TimedViewMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request):
+        return HttpResponse(instrumentation.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ManagerViews(TimedViewMixin, APIView):
     permission_classes = [IsAuthenticated, IsManager]
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_classes = [AnonThrottle, UserThrottle]
 
     def get(self, request):
         queryset = User.objects.filter(groups__name='Manager')
@@ -222,9 +419,9 @@ class ManagerViews(APIView):
         user.save()
         return Response({"message": "user removed from the manager group"}, status=status.HTTP_200_OK)
 
-class DeliveryCrewViews(APIView):
+class DeliveryCrewViews(TimedViewMixin, APIView):
     permission_classes = [IsAuthenticated, IsManager]
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_classes = [AnonThrottle, UserThrottle]
     
     def get(self, request):
         queryset = User.objects.filter(groups__name='Delivery Crew')